@@ -0,0 +1,495 @@
+import json
+import os
+import uuid
+from itertools import islice
+
+import numpy as np
+
+from game_table import GameTable
+from binary_storage import map_table
+from sqlite_storage import connect, query_builds, query_rating_series, query_tallies, query_totals
+from storage import (atomic_path, binary_filename, database_filename, drop_partial_record, files_lock, iter_journal,
+                     iter_matches, journal_filename, uses_binary, uses_database)
+from vocabulary import hero_vocabulary, item_vocabulary, relic_mask, unique_mask
+
+
+class Tally(dict):
+    # Maps a key to [games, wins], in order of first appearance.
+    def add(self, key, games, wins):
+        if key not in self:
+            self[key] = [0, 0]
+        self[key][0] += games
+        self[key][1] += wins
+
+    def merge(self, other):
+        for key, (games, wins) in other.items():
+            self.add(key, games, wins)
+        return self
+
+    def to_list(self):
+        return [[key, games, wins] for key, (games, wins) in self.items()]
+
+    @staticmethod
+    def from_list(values):
+        # JSON turns tuple keys, such as item pairs, into lists.
+        return Tally((tuple(key) if isinstance(key, list) else key, [games, wins]) for key, games, wins in values)
+
+
+class Counts:
+    # Games and wins per cell of an array that grows to fit, accumulated over
+    # chunks of games and turned into a Tally once, in order of first appearance.
+    def __init__(self, dimensions=1):
+        shape = (0,) * dimensions
+        self.games = np.zeros(shape, dtype=np.int64)
+        self.wins = np.zeros(shape, dtype=np.int64)
+        self.first = np.full(shape, -1, dtype=np.int64)
+        self.seen = 0
+
+    def add(self, index, won, weights=None):
+        # index holds one array of cell coordinates per dimension.
+        shape = tuple(max(size, int(column.max()) + 1) if len(column) else size
+                      for size, column in zip(self.games.shape, index))
+        if shape != self.games.shape:
+            padding = [(0, new - old) for old, new in zip(self.games.shape, shape)]
+            self.games = np.pad(self.games, padding)
+            self.wins = np.pad(self.wins, padding)
+            self.first = np.pad(self.first, padding, constant_values=-1)
+        cells, first, inverse = np.unique(np.ravel_multi_index(index, shape), return_index=True,
+                                          return_inverse=True)
+        if weights is None:
+            weights = np.ones(len(inverse), dtype=np.int64)
+        self.games.reshape(-1)[cells] += np.bincount(inverse, weights, len(cells)).astype(np.int64)
+        self.wins.reshape(-1)[cells] += np.bincount(inverse, weights * won, len(cells)).astype(np.int64)
+        seen = self.first.reshape(-1)
+        new = seen[cells] < 0
+        seen[cells[new]] = self.seen + first[new]
+        self.seen += len(inverse)
+
+    def tally(self, key):
+        # key maps the coordinate arrays of the cells seen, in that order, to
+        # their keys.
+        seen = self.first.reshape(-1)
+        cells = np.flatnonzero(seen >= 0)
+        cells = cells[np.argsort(seen[cells])]
+        games = self.games.reshape(-1)[cells].tolist()
+        wins = self.wins.reshape(-1)[cells].tolist()
+        return Tally(zip(key(*np.unravel_index(cells, self.games.shape)), map(list, zip(games, wins))))
+
+
+def slots(index, values):
+    # Dense slots for values of an open range, such as ratings, kept in index.
+    keys, inverse = np.unique(values, return_inverse=True)
+    return np.array([index.setdefault(key, len(index)) for key in keys.tolist()], dtype=np.int64)[inverse]
+
+
+class Accumulator:
+    # The aggregates of a stream of GameTable chunks. Every tally is counted
+    # in arrays over hero and item ids shared by all the chunks, and built as
+    # a Tally once at the end rather than once per chunk and merged.
+    def __init__(self):
+        self.heroes = hero_vocabulary()
+        self.items = item_vocabulary()
+        self.ratings = {}
+        self.copies = {}
+        self.matches = 0
+        self.games = 0
+        self.wins = 0
+        self.counts = {name: Counts() for name in TALLIES}
+        for name in ("hero_items", "item_copies", "item_pairs"):
+            self.counts[name] = Counts(2)
+        self.rating_series = []
+
+    def add(self, table):
+        # Chunks may have vocabularies of their own, such as binary files.
+        heroes = np.array([self.heroes.id(hero) for hero in table.heroes], dtype=np.int64)
+        items = np.array([self.items.id(item) for item in table.item_names], dtype=np.int64)
+        counts = self.counts
+        won = table.result.astype(np.int64)
+        self.matches += table.match_count
+        self.games += len(table)
+        self.wins += int(won.sum())
+
+        counts["opponents"].add((heroes[table.opponent_hero],), won)
+        counts["game_numbers"].add((table.game_index,), won)
+        counts["trophies"].add((table.trophies,), won)
+        valid = np.isfinite(table.opponent_rating)
+        counts["ratings"].add((slots(self.ratings, table.opponent_rating[valid]),), won[valid])
+
+        item_ids = items[table.item_ids]
+        item_won = won[table.item_rows]
+        counts["items"].add((item_ids,), item_won, table.item_counts.astype(np.int64))
+        counts["item_games"].add((item_ids,), item_won)
+        counts["hero_items"].add((heroes[table.hero[table.item_rows]], item_ids), item_won)
+        counts["item_copies"].add((slots(self.copies, table.item_counts), item_ids), item_won)
+        entries = relic_mask(table.item_names)[table.item_ids]
+        counts["relics"].add((item_ids[entries],), item_won[entries])
+        entries = unique_mask(table.heroes, table.item_names)[table.hero[table.item_rows], table.item_ids]
+        counts["uniques"].add((item_ids[entries],), item_won[entries])
+
+        # Every pair of items in a game, the nonzero pattern of the item
+        # co-occurrence product, a few chunks at a time to bound its memory.
+        for chunk in table.chunks(PAIR_CHUNK_MATCHES):
+            first, second = chunk.entry_pairs()
+            a, b = items[chunk.item_ids[first]], items[chunk.item_ids[second]]
+            counts["item_pairs"].add((np.minimum(a, b), np.maximum(a, b)),
+                                     chunk.result[chunk.item_rows[first]].astype(np.int64))
+
+        self.rating_series.extend(np.stack([table.start_rating, table.end_rating], axis=1).tolist())
+        return self
+
+    def aggregates(self):
+        heroes = np.array(self.heroes.names, dtype=object)
+        items = np.array(self.items.names, dtype=object)
+        ratings = np.array(list(self.ratings), dtype=np.float64)
+        copies = np.array(list(self.copies), dtype=np.int64)
+        rank = np.empty(len(items), dtype=np.int64)
+        rank[np.argsort(self.items.names, kind="stable")] = np.arange(len(items))
+
+        def item_names(ids):
+            return items[ids].tolist()
+
+        def pair_names(a, b):
+            # Each pair in name order.
+            swap = rank[a] > rank[b]
+            return list(zip(items[np.where(swap, b, a)].tolist(), items[np.where(swap, a, b)].tolist()))
+
+        keys = {
+            "opponents": lambda ids: heroes[ids].tolist(),
+            "items": item_names,
+            "item_games": item_names,
+            "relics": item_names,
+            "uniques": item_names,
+            "game_numbers": lambda index: (index + 1).tolist(),
+            "trophies": lambda index: index.tolist(),
+            "ratings": lambda index: ratings[index].tolist(),
+            "item_pairs": pair_names,
+            "hero_items": lambda hero, ids: list(zip(heroes[hero].tolist(), items[ids].tolist())),
+            "item_copies": lambda index, ids: list(zip(items[ids].tolist(), copies[index].tolist())),
+        }
+        aggregates = Aggregates()
+        aggregates.matches = self.matches
+        aggregates.games = self.games
+        aggregates.wins = self.wins
+        for name in TALLIES:
+            setattr(aggregates, name, self.counts[name].tally(keys[name]))
+        aggregates.rating_series = self.rating_series
+        return aggregates
+
+
+def build_tally(table, won):
+    # One key per distinct (own hero, sorted item set): a weighted transaction
+    # list for frequent build mining. Each game becomes a row of its hero and
+    # its item ranks in name order, padded with -1; sorting the rows brings
+    # equal builds together.
+    names = sorted(table.item_names)
+    rank = np.empty(len(names), dtype=np.int16)
+    rank[np.argsort(table.item_names, kind="stable")] = np.arange(len(names))
+    sizes = np.diff(table.item_ptr)
+    order = np.lexsort((rank[table.item_ids], table.item_rows))
+    rows = np.full((len(table), 1 + (int(sizes.max()) if len(table) else 0)), -1, dtype=np.int16)
+    rows[:, 0] = table.hero
+    rows[table.item_rows, 1 + np.arange(len(order)) - np.repeat(table.item_ptr[:-1], sizes)] = \
+        rank[table.item_ids[order]]
+
+    order = np.lexsort(rows.T[::-1])
+    starts = np.ones(len(rows), dtype=bool)
+    starts[1:] = (rows[order[1:]] != rows[order[:-1]]).any(axis=1)
+    inverse = np.empty(len(rows), dtype=np.int64)
+    inverse[order] = np.cumsum(starts) - 1
+    # The sort is stable, so each build's first row is its first game.
+    first = order[starts]
+    games = np.bincount(inverse, minlength=len(first)).tolist()
+    wins = np.bincount(inverse, weights=won, minlength=len(first)).astype(np.int64).tolist()
+
+    first_seen = np.sort(first)
+    heroes = np.array(table.heroes, dtype=object)[rows[first_seen, 0]].tolist()
+    items = np.array(names + [None], dtype=object)[rows[first_seen, 1:]].tolist()
+    builds = Tally()
+    for game, hero, build, size in zip(inverse[first_seen].tolist(), heroes, items, sizes[first_seen].tolist()):
+        builds[(hero,) + tuple(build[:size])] = [games[game], wins[game]]
+    return builds
+
+
+def storage_tables(filename):
+    # The history as GameTable chunks; the caller holds the files lock.
+    if uses_binary(filename):
+        table = map_table(binary_filename(filename))
+        yield from table.chunks(TABLE_CHUNK_MATCHES)
+        matches = iter_journal(filename, table.match_count)
+    else:
+        matches = iter_matches(filename)
+    while True:
+        batch = list(islice(matches, CHUNK_MATCHES))
+        if not batch:
+            return
+        yield GameTable.from_data({"matches": batch})
+
+
+def storage_builds(filename):
+    with files_lock(filename, shared=True):
+        if uses_database(filename):
+            connection = connect(database_filename(filename))
+            try:
+                return Tally(query_builds(connection))
+            finally:
+                connection.close()
+        builds = Tally()
+        for table in storage_tables(filename):
+            builds.merge(build_tally(table, table.result.astype(np.int64)))
+        return builds
+
+
+CACHE_VERSION = 7
+CHUNK_MATCHES = 1000
+TABLE_CHUNK_MATCHES = 5000
+PAIR_CHUNK_MATCHES = 10000
+# Builds are nearly one key per game, so they are not tallied with the rest,
+# cached or sent between processes: Aggregates.item_builds mines them from
+# the histories of its sources when a statistic first asks.
+TALLIES = (
+    "opponents", "items", "item_games", "relics", "uniques",
+    "game_numbers", "trophies", "ratings", "item_pairs", "hero_items", "item_copies",
+)
+
+
+def cache_filename(filename):
+    return filename.replace("_stats.json", "_aggregates.json")
+
+
+def delta_filename(filename):
+    return filename.replace("_stats.json", "_aggregate_deltas.jsonl")
+
+
+def source_signature(filename):
+    signature = []
+    for path in (filename, binary_filename(filename), journal_filename(filename), database_filename(filename)):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            signature.append([stat.st_size, stat.st_mtime_ns])
+        else:
+            signature.append(None)
+    return signature
+
+
+# The cache is a base file, a header line and the aggregates, plus a file of
+# deltas appended since, each the aggregates of the matches one write added.
+# Deltas name the base they were appended to, so they are never applied to a
+# base written later; compaction folds them into a new base.
+def read_cache_header(filename):
+    with open(cache_filename(filename), "r", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+    if header["version"] != CACHE_VERSION:
+        raise ValueError(f"cache version {header['version']}")
+    return header
+
+
+def read_deltas(filename):
+    try:
+        with open(delta_filename(filename), "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Partial record left behind by an interrupted write.
+                    return
+                yield json.loads(line)
+    except FileNotFoundError:
+        return
+
+
+def last_delta(filename):
+    # Only the end of the file is read, back to the start of its last
+    # complete record.
+    try:
+        with open(delta_filename(filename), "rb") as f:
+            position = f.seek(0, os.SEEK_END)
+            tail = b""
+            while position > 0 and tail.count(b"\n") < 2:
+                start = max(0, position - 65536)
+                f.seek(start)
+                tail = f.read(position - start) + tail
+                position = start
+    except FileNotFoundError:
+        return None
+    records = tail.split(b"\n")[:-1]
+    return json.loads(records[-1]) if records else None
+
+
+def fresh_cache(filename):
+    # The id of the cache's base if the cache is up to date with the history,
+    # else None; read without loading the aggregates.
+    try:
+        header = read_cache_header(filename)
+        source = header["source"]
+        delta = last_delta(filename)
+        if delta is not None and delta["base"] == header["id"]:
+            source = delta["source"]
+        return header["id"] if source == source_signature(filename) else None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def load_cache(filename):
+    try:
+        with open(cache_filename(filename), "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header["version"] != CACHE_VERSION:
+                return None
+            aggregates = Aggregates.from_dict(json.loads(f.readline()))
+        source = header["source"]
+        for delta in read_deltas(filename):
+            if delta["base"] == header["id"]:
+                aggregates.merge(Aggregates.from_dict(delta["aggregates"]))
+                source = delta["source"]
+        if source != source_signature(filename):
+            return None
+        return aggregates
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_cache(filename, aggregates, source=None):
+    # Pass the signature taken before reading the history when other
+    # processes may append to it meanwhile, so a stale cache is never trusted.
+    header = {
+        "version": CACHE_VERSION,
+        "id": uuid.uuid4().hex,
+        "source": source_signature(filename) if source is None else source,
+    }
+    with atomic_path(cache_filename(filename)) as temp_filename:
+        with open(temp_filename, "w", encoding="utf-8") as f:
+            # json.dumps encodes in C; json.dump would encode in Python.
+            f.write(json.dumps(header) + "\n")
+            f.write(json.dumps(aggregates.to_dict(), ensure_ascii=False) + "\n")
+    try:
+        os.remove(delta_filename(filename))
+    except FileNotFoundError:
+        pass
+
+
+def append_cache(filename, base, aggregates):
+    # Adds the aggregates of matches just written to a cache that fresh_cache
+    # found up to date before they were; the caller holds the writer lock.
+    # Costs as much as those matches, however long the history.
+    path = delta_filename(filename)
+    if os.path.exists(path):
+        drop_partial_record(path)
+    delta = {"base": base, "source": source_signature(filename), "aggregates": aggregates.to_dict()}
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(delta, ensure_ascii=False) + "\n")
+
+
+class Aggregates:
+    def __init__(self):
+        self.matches = 0
+        self.games = 0
+        self.wins = 0
+        self.opponents = Tally()
+        self.items = Tally()
+        self.item_games = Tally()
+        self.relics = Tally()
+        self.uniques = Tally()
+        self.game_numbers = Tally()
+        self.trophies = Tally()
+        self.ratings = Tally()
+        self.item_pairs = Tally()
+        self.builds = None
+        self.hero_items = Tally()
+        self.item_copies = Tally()
+        self.rating_series = []
+        self.sources = []
+
+    @staticmethod
+    def from_data(data):
+        return Aggregates.from_table(GameTable.from_data(data))
+
+    @staticmethod
+    def from_matches(matches):
+        accumulator = Accumulator()
+        matches = iter(matches)
+        while True:
+            batch = list(islice(matches, CHUNK_MATCHES))
+            if not batch:
+                return accumulator.aggregates()
+            accumulator.add(GameTable.from_data({"matches": batch}))
+
+    @staticmethod
+    def from_database(path, **filters):
+        connection = connect(path)
+        try:
+            aggregates = Aggregates()
+            aggregates.rating_series = query_rating_series(connection, filters.get("hero"))
+            aggregates.matches = len(aggregates.rating_series)
+            aggregates.games, aggregates.wins = query_totals(connection, **filters)
+            for name, counts in query_tallies(connection, **filters).items():
+                setattr(aggregates, name, Tally(counts))
+            if filters:
+                # Mining the sources again would drop the filters.
+                aggregates.builds = Tally(query_builds(connection, **filters))
+            return aggregates
+        finally:
+            connection.close()
+
+    @staticmethod
+    def from_storage(filename):
+        with files_lock(filename, shared=True):
+            if uses_database(filename):
+                aggregates = Aggregates.from_database(database_filename(filename))
+            else:
+                accumulator = Accumulator()
+                for table in storage_tables(filename):
+                    accumulator.add(table)
+                aggregates = accumulator.aggregates()
+        aggregates.sources = [filename]
+        return aggregates
+
+    @staticmethod
+    def from_table(table):
+        return Accumulator().add(table).aggregates()
+
+    def item_usage(self, hero=None):
+        # Games per item, optionally only the games played as hero.
+        if hero is None:
+            return {item: games for item, (games, _) in self.item_games.items()}
+        return {item: games for (owner, item), (games, _) in self.hero_items.items() if owner == hero}
+
+    def item_builds(self):
+        if self.builds is None:
+            self.builds = Tally()
+            for filename in self.sources:
+                self.builds.merge(storage_builds(filename))
+        return self.builds
+
+    def merge(self, other):
+        self.matches += other.matches
+        self.games += other.games
+        self.wins += other.wins
+        for name in TALLIES:
+            getattr(self, name).merge(getattr(other, name))
+        # Mined again from the merged sources on next use.
+        self.builds = None
+        self.rating_series.extend(other.rating_series)
+        self.sources.extend(source for source in other.sources if source not in self.sources)
+        return self
+
+    def to_dict(self):
+        result = {
+            "matches": self.matches,
+            "games": self.games,
+            "wins": self.wins,
+            "rating_series": self.rating_series,
+            "sources": self.sources,
+        }
+        for name in TALLIES:
+            result[name] = getattr(self, name).to_list()
+        return result
+
+    @staticmethod
+    def from_dict(values):
+        aggregates = Aggregates()
+        aggregates.matches = values["matches"]
+        aggregates.games = values["games"]
+        aggregates.wins = values["wins"]
+        aggregates.rating_series = values["rating_series"]
+        aggregates.sources = values["sources"]
+        for name in TALLIES:
+            setattr(aggregates, name, Tally.from_list(values[name]))
+        return aggregates
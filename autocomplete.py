@@ -1,26 +1,77 @@
 import readline
+from bisect import bisect_left
+
+from fuzzy import NGramIndex
+
+DISPLAY_LIMIT = 30
+
+# The largest code point: text + LAST_CHAR sorts after every string starting with text.
+LAST_CHAR = "\U0010ffff"
+
+# Completers built so far, by id() of their options list, and the one installed in readline.
+completers = {}
+active = None
 
 
 class Completer:
     def __init__(self, options):
-        self.options = sorted(options)
-    
+        self.options = sorted(set(option for option in options if option))
+        self.matches = []
+        self.index = NGramIndex(self.options)
+        # Usage counts rank the matches; ties stay alphabetical.
+        self.counts = {}
+        self.prompt = ""
+
+    def prefix_matches(self, text):
+        start = bisect_left(self.options, text)
+        end = bisect_left(self.options, text + LAST_CHAR, start)
+        return self.options[start:end]
+
+    def rank(self, matches):
+        return sorted(matches, key=lambda option: -self.counts.get(option, 0))
+
     def complete(self, text, state):
         if state == 0:
-            self.matches = [s for s in self.options if s and s.startswith(text)]
+            self.matches = self.rank(self.prefix_matches(text))
         return self.matches[state] if state < len(self.matches) else None
 
+    def display_matches(self, substitution, matches, longest_match_length):
+        # readline sorts matches alphabetically before listing them, so list them here instead.
+        ranked = self.rank(matches)
+        more = f"  (+{len(ranked) - DISPLAY_LIMIT} more)" if len(ranked) > DISPLAY_LIMIT else ""
+        print("\n" + "  ".join(ranked[:DISPLAY_LIMIT]) + more)
+        print(self.prompt + readline.get_line_buffer(), end="", flush=True)
+
+
+def get_completer(options):
+    cached = completers.get(id(options))
+    if cached is None or cached[0] is not options:
+        cached = completers[id(options)] = (options, Completer(options))
+    return cached[1]
+
+
+def set_usage(options, counts):
+    get_completer(options).counts = counts
+
 
 def setup_autocomplete(options):
-    completer = Completer(options)
-    readline.set_completer(completer.complete)
-    readline.parse_and_bind("tab: complete")
-    readline.set_completer_delims("")
+    global active
+    completer = get_completer(options)
+    if active is None:
+        readline.parse_and_bind("tab: complete")
+        readline.set_completer_delims("")
+    if completer is not active:
+        readline.set_completer(completer.complete)
+        readline.set_completion_display_matches_hook(completer.display_matches)
+        active = completer
 
 
 def input_with_autocomplete(prompt, excpetion_message, options=None, validator=None):
+    completer = None
     if options:
         setup_autocomplete(options)
+        completer = get_completer(options)
+        completer.prompt = prompt
     
     while True:
         try:
@@ -35,3 +86,7 @@ def input_with_autocomplete(prompt, excpetion_message, options=None, validator=N
             return None
         except ValueError:
             print(excpetion_message)
+            suggestions = completer.index.suggest(user_input.lower()) if completer else []
+            if suggestions:
+                indent = excpetion_message[:len(excpetion_message) - len(excpetion_message.lstrip())]
+                print(f"{indent}Did you mean: {', '.join(suggestions)}?")
@@ -0,0 +1,114 @@
+import argparse
+import glob
+import json
+import os
+import time
+from multiprocessing import Pool
+
+from aggregates import Aggregates
+from render_charts import chart_tasks, load_aggregates, load_headless_plotting, render_chart
+from stats import AccurateWinRateByRating, RatingProgress
+from stats_displayer import available_stats
+from storage import binary_filename, database_filename, journal_filename
+
+USER_FILE_PATTERNS = ("*_stats.json", "*_stats.bin", "*_stats.db", "*_journal.jsonl")
+GLOBAL_REPORT = "_all_users"
+# Rating progress follows a single player's matches and has no cross-user meaning.
+GLOBAL_STATS = [stat for stat in available_stats if stat is not RatingProgress]
+
+
+def find_users(dirname):
+    users = set()
+    for pattern in USER_FILE_PATTERNS:
+        for path in glob.glob(os.path.join(dirname, pattern)):
+            users.add(os.path.basename(path)[:-len(pattern) + 1])
+    return sorted(users)
+
+
+def history_size(filename):
+    paths = (filename, binary_filename(filename), journal_filename(filename), database_filename(filename))
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def write_report(name, aggregates, output_dir, chart_format, options, statistics, start):
+    report = {
+        "user": name,
+        "matches": aggregates.matches,
+        "games": aggregates.games,
+        "wins": aggregates.wins,
+        "statistics": {},
+    }
+    for stat in statistics:
+        try:
+            report["statistics"][stat.__name__] = stat.summary(aggregates, **options)
+        except Exception as e:
+            report["statistics"][stat.__name__] = {"error": f"{type(e).__name__}: {e}"}
+
+    if chart_format:
+        charts = [(index, output) for index, output in chart_tasks(os.path.join(output_dir, name), chart_format)
+                  if available_stats[index] in statistics]
+        report["charts"] = {stat: output if error is None else {"error": error}
+                            for stat, output, _, error in
+                            (render_chart(aggregates, index, output, options) for index, output in charts)}
+
+    report["seconds"] = time.perf_counter() - start
+    with open(os.path.join(output_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    return report
+
+
+def report_user(task):
+    user, filename, output_dir, chart_format, options = task
+    start = time.perf_counter()
+    aggregates = load_aggregates(filename)
+    write_report(user, aggregates, output_dir, chart_format, options, available_stats, start)
+
+    # Only the mergeable tallies travel back for the cross-user report.
+    aggregates.rating_series = []
+    return user, aggregates.to_dict(), time.perf_counter() - start
+
+
+def report_global(results, output_dir, chart_format, options):
+    start = time.perf_counter()
+    aggregates = Aggregates()
+    # Merging in user order keeps the first-seen order of ties reproducible.
+    for user in sorted(results):
+        aggregates.merge(Aggregates.from_dict(results[user]))
+    write_report(GLOBAL_REPORT, aggregates, output_dir, chart_format, options, GLOBAL_STATS, start)
+    return aggregates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize every statistic for every user in data/.")
+    parser.add_argument("--data", default="data", help="directory with user stats files (default: data)")
+    parser.add_argument("--output", default="reports", help="output directory (default: reports)")
+    parser.add_argument("--charts", choices=("png", "svg"), help="also render every chart in this format")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--bandwidth", default="fixed", choices=tuple(AccurateWinRateByRating.BANDWIDTH_MODES),
+                        help="rating curve bandwidth (default: fixed)")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    if args.charts:
+        load_headless_plotting()
+
+    filenames = {user: os.path.join(args.data, f"{user}_stats.json") for user in find_users(args.data)}
+    # Largest histories first, so a big file never starts last and holds up the batch.
+    users = sorted(filenames, key=lambda user: history_size(filenames[user]), reverse=True)
+    options = AccurateWinRateByRating.BANDWIDTH_MODES[args.bandwidth]
+    tasks = [(user, filenames[user], args.output, args.charts, options) for user in users]
+
+    start = time.perf_counter()
+    results = {}
+    # Spawned workers do not inherit the backend, so each one selects Agg itself.
+    with Pool(args.processes, initializer=load_headless_plotting if args.charts else None) as pool:
+        for user, values, seconds in pool.imap_unordered(report_user, tasks, chunksize=1):
+            results[user] = values
+            print(f"{user}: {values['games']} games in {seconds:.2f}s")
+    aggregates = report_global(results, args.output, args.charts, options)
+    print(f"All users: {aggregates.games} games")
+    print(f"Reported {len(tasks)} users in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import struct
+
+import numpy as np
+
+from game_table import GameTable
+
+MAGIC = b"BBST"
+VERSION = 2
+HEADER = struct.Struct("<4sHHIIII")
+
+# Version 2 stores every GameTable column as its own contiguous section, so a
+# memory-mapped file can be used as a table without copying.
+MATCH_COLUMNS = (
+    ("start_rating", "<i4"),
+    ("end_rating", "<i4"),
+    ("match_hero", "<u2"),
+)
+GAME_COLUMNS = (
+    ("result", "i1"),
+    ("opponent_rating", "<f8"),
+    ("hero", "<u2"),
+    ("opponent_hero", "<u2"),
+    ("match_index", "<u4"),
+    ("game_index", "<u2"),
+    ("trophies", "<u2"),
+)
+ENTRY_COLUMNS = (
+    ("item_ids", "<u2"),
+    ("item_counts", "<u2"),
+)
+
+# Version 1 layout: fixed-width match, game and item records.
+MATCH_RECORD = np.dtype([
+    ("start_rating", "<i4"),
+    ("end_rating", "<i4"),
+    ("hero", "<u2"),
+    ("games", "<u2"),
+])
+GAME_RECORD = np.dtype([
+    ("opponent_rating", "<f8"),
+    ("opponent_hero", "<u2"),
+    ("items", "<u2"),
+    ("result", "i1"),
+], align=True)
+ITEM_RECORD = np.dtype([
+    ("item", "<u2"),
+    ("count", "<u2"),
+])
+
+
+def padding(size):
+    return -size % 8
+
+
+def encode(table):
+    names = [name.encode("utf-8") for name in table.heroes + table.item_names]
+    offsets = np.cumsum([0] + [len(name) for name in names], dtype=np.uint32)
+    strings = offsets.astype("<u4").tobytes() + b"".join(names)
+
+    header = HEADER.pack(MAGIC, VERSION, len(table.heroes), len(table.item_names),
+                         table.match_count, len(table), len(table.item_ids))
+    sections = [header, strings]
+    for name, dtype in MATCH_COLUMNS + GAME_COLUMNS + (("item_ptr", "<i8"),) + ENTRY_COLUMNS:
+        sections.append(np.ascontiguousarray(getattr(table, name), dtype=dtype).tobytes())
+    return b"".join(section + b"\0" * padding(len(section)) for section in sections)
+
+
+def decode(buffer):
+    magic, version, hero_count, item_count, match_count, game_count, entry_count = \
+        HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a stats binary file.")
+    if version not in (1, VERSION):
+        raise ValueError(f"Unsupported stats binary version {version}.")
+
+    position = HEADER.size + padding(HEADER.size)
+    offsets = np.frombuffer(buffer, dtype="<u4", count=hero_count + item_count + 1, offset=position)
+    position += offsets.nbytes
+    blob = bytes(buffer[position:position + int(offsets[-1])])
+    position += int(offsets[-1])
+    position += padding(position)
+    bounds = offsets.tolist()
+    names = [blob[start:end].decode("utf-8") for start, end in zip(bounds, bounds[1:])]
+
+    if version == 1:
+        return decode_records(buffer, position, names, hero_count, match_count, game_count, entry_count)
+
+    columns = {}
+    for layout, count in ((MATCH_COLUMNS, match_count), (GAME_COLUMNS, game_count),
+                          ((("item_ptr", "<i8"),), game_count + 1), (ENTRY_COLUMNS, entry_count)):
+        for name, dtype in layout:
+            columns[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=position)
+            position += columns[name].nbytes
+            position += padding(position)
+
+    return GameTable(heroes=names[:hero_count], item_names=names[hero_count:], **columns)
+
+
+def decode_records(buffer, position, names, hero_count, match_count, game_count, entry_count):
+    sections = []
+    for dtype, count in ((MATCH_RECORD, match_count), (GAME_RECORD, game_count), (ITEM_RECORD, entry_count)):
+        sections.append(np.frombuffer(buffer, dtype=dtype, count=count, offset=position))
+        position += dtype.itemsize * count
+        position += padding(position)
+    matches, games, entries = sections
+
+    match_index = np.repeat(np.arange(match_count, dtype=np.int32), matches["games"])
+    first_games = np.cumsum(matches["games"], dtype=np.int64) - matches["games"]
+    result = games["result"]
+    wins_before = np.cumsum(result, dtype=np.int64) - result
+    starts = first_games[match_index]
+
+    return GameTable(
+        heroes=names[:hero_count],
+        item_names=names[hero_count:],
+        result=result,
+        opponent_rating=games["opponent_rating"],
+        hero=matches["hero"][match_index],
+        opponent_hero=games["opponent_hero"],
+        match_index=match_index,
+        game_index=(np.arange(game_count) - starts).astype(np.int16),
+        trophies=(wins_before - wins_before[starts]).astype(np.int16),
+        start_rating=matches["start_rating"],
+        end_rating=matches["end_rating"],
+        match_hero=matches["hero"],
+        item_ptr=np.concatenate(([0], np.cumsum(games["items"], dtype=np.int64))),
+        item_ids=entries["item"],
+        item_counts=entries["count"],
+    )
+
+
+def write_table(path, table):
+    with open(path, "wb") as f:
+        f.write(encode(table))
+
+
+def read_table(path):
+    with open(path, "rb") as f:
+        return decode(f.read())
+
+
+def map_table(path):
+    return decode(np.memmap(path, dtype=np.uint8, mode="r"))
+
+
+def table_to_data(table):
+    matches = []
+    opponent_ratings = table.opponent_rating.tolist()
+    results = table.result.tolist()
+    opponent_heroes = table.opponent_hero.tolist()
+    match_heroes = table.match_hero.tolist()
+    item_ptr = table.item_ptr.tolist()
+    item_ids = table.item_ids.tolist()
+    item_counts = table.item_counts.tolist()
+    match_games = np.bincount(table.match_index, minlength=table.match_count).tolist()
+
+    first = 0
+    for m, (start_rating, end_rating) in enumerate(zip(table.start_rating.tolist(), table.end_rating.tolist())):
+        match = {
+            "start_rating": start_rating,
+            "end_rating": end_rating,
+            "hero": table.heroes[match_heroes[m]],
+            "games": [],
+        }
+        for game in range(first, first + match_games[m]):
+            rating = opponent_ratings[game]
+            if rating != rating:
+                rating = None
+            elif rating.is_integer():
+                rating = int(rating)
+            match["games"].append({
+                "result": "W" if results[game] else "L",
+                "opponent_rating": rating,
+                "opponent_hero": table.heroes[opponent_heroes[game]],
+                "items": {table.item_names[item]: count for item, count in zip(
+                    item_ids[item_ptr[game]:item_ptr[game + 1]],
+                    item_counts[item_ptr[game]:item_ptr[game + 1]])},
+            })
+        first += match_games[m]
+        matches.append(match)
+
+    return {"matches": matches}
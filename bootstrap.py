@@ -0,0 +1,72 @@
+from multiprocessing import Pool
+
+import numpy as np
+
+REPLICATES = 2000
+CONFIDENCE = 0.95
+CHUNK_REPLICATES = 500
+SEED = 0
+
+# Poisson bootstrap: every game gets an independent Poisson(1) weight, and a
+# sum of n Poisson(1) weights is one Poisson(n) draw, so the replicate wins
+# and losses of a key are Poisson draws around the observed counts. Keys
+# counted once per copy of an item take strata of games holding the same
+# number of copies, whose weights count that many times. The [games, wins]
+# tallies are enough; raw games are never needed.
+
+
+def replicate_win_rates(games, wins, copies, starts, replicates, seed):
+    rng = np.random.default_rng(seed)
+    size = (replicates, len(games))
+    replicate_wins = rng.poisson(wins, size) * copies
+    replicate_games = replicate_wins + rng.poisson(games - wins, size) * copies
+    if starts is not None:
+        replicate_wins = np.add.reduceat(replicate_wins, starts, axis=1)
+        replicate_games = np.add.reduceat(replicate_games, starts, axis=1)
+    with np.errstate(invalid="ignore"):
+        return replicate_wins / replicate_games
+
+
+def replicate_in_worker(task):
+    return replicate_win_rates(*task)
+
+
+def confidence_intervals(games, wins, copies=1, sizes=None, replicates=REPLICATES, confidence=CONFIDENCE, seed=SEED,
+                         processes=None):
+    # With sizes, games and wins are strata: sizes[k] consecutive ones per key.
+    games = np.asarray(games, dtype=np.int64)
+    wins = np.asarray(wins, dtype=np.int64)
+    if len(games) == 0:
+        return np.zeros(0), np.zeros(0)
+    starts = None if sizes is None else np.cumsum(sizes) - sizes
+
+    # One child seed per block of replicates, whichever process draws it, so
+    # the result does not depend on the number of processes.
+    blocks = range(0, replicates, CHUNK_REPLICATES)
+    seeds = np.random.SeedSequence(seed).spawn(len(blocks))
+    tasks = [(games, wins, copies, starts, min(CHUNK_REPLICATES, replicates - start), child)
+             for start, child in zip(blocks, seeds)]
+    if processes is None or processes <= 1:
+        rates = np.concatenate([replicate_in_worker(task) for task in tasks])
+    else:
+        with Pool(processes) as pool:
+            rates = np.concatenate(pool.map(replicate_in_worker, tasks))
+
+    tail = (1 - confidence) / 2 * 100
+    lower, upper = np.nanpercentile(rates, [tail, 100 - tail], axis=0)
+    return lower, upper
+
+
+def tally_intervals(tally, keys, copies=None, **kwargs):
+    # copies maps (key, count) to the [games, wins] of the games holding count
+    # copies of key; pass it when tally counts every copy.
+    if copies is None:
+        counts = np.array([tally[key] for key in keys], dtype=np.int64).reshape(-1, 2)
+        return confidence_intervals(counts[:, 0], counts[:, 1], **kwargs)
+
+    strata = {}
+    for (key, count), (games, wins) in copies.items():
+        strata.setdefault(key, []).append([count, games, wins])
+    rows = np.array([row for key in keys for row in strata[key]], dtype=np.int64).reshape(-1, 3)
+    return confidence_intervals(rows[:, 1], rows[:, 2], copies=rows[:, 0],
+                                sizes=np.array([len(strata[key]) for key in keys], dtype=np.int64), **kwargs)
@@ -0,0 +1,266 @@
+import argparse
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from aggregates import CHUNK_MATCHES, Accumulator, append_cache, fresh_cache
+from game_table import GameTable
+from sqlite_storage import Database
+from storage import Journal, database_filename, files_lock, uses_database, writer_lock
+from vocabulary import HERO_SET, ITEM_SET
+
+FIELDS = ("match", "start_rating", "end_rating", "hero", "result", "opponent_rating", "opponent_hero", "items")
+ITEM_SEPARATOR = ";"
+
+
+def read_csv(f):
+    reader = csv.DictReader(f)
+    missing = [field for field in FIELDS if field not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(missing)}")
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl(f):
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+            continue
+        yield line_number, row
+
+
+def integer(value, field):
+    if type(value) is int:
+        return value
+    if type(value) is str:
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise ValueError(f"{field} must be an integer, got {value!r}")
+
+
+def hero(value, field):
+    if value in HERO_SET:
+        return value
+    if isinstance(value, str) and value.strip().lower() in HERO_SET:
+        return value.strip().lower()
+    raise ValueError(f"unknown {field} {value!r}")
+
+
+def result(value, field):
+    if value == "W" or value == "L":
+        return value
+    if isinstance(value, str) and value.strip().upper() in ("W", "L"):
+        return value.strip().upper()
+    raise ValueError(f"{field} must be W or L, got {value!r}")
+
+
+def check_items(names):
+    if not ITEM_SET.issuperset(names):
+        unknown = [item for item in dict.fromkeys(names) if item not in ITEM_SET]
+        raise ValueError(f"unknown items {', '.join(map(repr, unknown))}")
+
+
+def item_counts(value, field):
+    # CSV cells list the items separated by ';', repeated once per copy.
+    # JSON rows may also give a list of names or a {name: count} object.
+    if isinstance(value, dict):
+        items = {}
+        for item, count in value.items():
+            if type(count) is not int or count < 1:
+                raise ValueError(f"count of {item!r} must be a positive integer, got {count!r}")
+            items[item.strip().lower()] = items.get(item.strip().lower(), 0) + count
+        check_items(items)
+        return dict(sorted(items.items()))
+    if isinstance(value, list):
+        unknown = [item for item in value if not isinstance(item, str)]
+        if unknown:
+            raise ValueError(f"unknown items {', '.join(map(repr, unknown))}")
+        names = [item.strip().lower() for item in value]
+    elif isinstance(value, str):
+        names = value.lower().split(ITEM_SEPARATOR)
+        if not ITEM_SET.issuperset(names):
+            names = [item.strip() for item in names if item.strip()]
+            check_items(names)
+    elif value is None:
+        return {}
+    else:
+        raise ValueError(f"{field} must be a list, an object or a string, got {value!r}")
+
+    if not isinstance(value, str):
+        check_items(names)
+    names.sort()
+    items = dict.fromkeys(names, 1)
+    if len(items) < len(names):
+        for item in items:
+            items[item] = 0
+        for item in names:
+            items[item] += 1
+    return items
+
+
+MATCH_PARSERS = {"start_rating": integer, "end_rating": integer, "hero": hero}
+GAME_PARSERS = {"result": result, "opponent_rating": integer, "opponent_hero": hero, "items": item_counts}
+
+
+def match_key(row):
+    # Rows without a match value are one-game matches.
+    key = row.get("match") if isinstance(row, dict) else None
+    return None if key == "" else key
+
+
+def parse_row(row, previous=None):
+    # previous: the raw and parsed match fields of the row before, which the
+    # other games of a match repeat, so they are only parsed once per match.
+    if not isinstance(row, dict):
+        raise ValueError(f"expected an object, got {row!r}")
+    get = row.get
+    try:
+        raw = (get("start_rating"), get("end_rating"), get("hero"))
+        if previous is not None and previous[0] == raw:
+            fields = previous[1]
+        else:
+            fields = {"start_rating": integer(raw[0], "start_rating"), "end_rating": integer(raw[1], "end_rating"),
+                      "hero": hero(raw[2], "hero")}
+        return raw, fields, {
+            "result": result(get("result"), "result"),
+            "opponent_rating": integer(get("opponent_rating"), "opponent_rating"),
+            "opponent_hero": hero(get("opponent_hero"), "opponent_hero"),
+            "items": item_counts(get("items"), "items"),
+        }
+    except ValueError:
+        pass
+    # Parse the row again field by field to report every problem in it.
+    errors = []
+    for field, parse in {**MATCH_PARSERS, **GAME_PARSERS}.items():
+        try:
+            parse(row.get(field), field)
+        except ValueError as e:
+            errors.append(str(e))
+    raise ValueError("; ".join(errors))
+
+
+def parse_matches(path, rows, report):
+    # Consecutive rows with the same match value are the games of one match,
+    # in order. A match with any invalid row is dropped whole, since skipping
+    # one game would shift the game numbers and trophies of the rest.
+    key = match = match_fields = previous = None
+    valid = False
+    for line_number, row in rows:
+        # An unreadable line may belong to the current match, so it spoils it.
+        row_key = key if isinstance(row, Exception) and match is not None else match_key(row)
+        try:
+            if isinstance(row, Exception):
+                raise ValueError(f"invalid JSON: {row}")
+            raw, fields, game = parse_row(row, previous)
+            previous = raw, fields
+        except ValueError as e:
+            report(f"{path}:{line_number}: {e}")
+            fields = game = None
+
+        if match is None or row_key is None or row_key != key:
+            if valid:
+                yield match
+            key, match, match_fields, valid = row_key, {}, fields, fields is not None
+            if valid:
+                match = dict(fields, games=[])
+        elif valid and fields is not None and fields is not match_fields \
+                and any(fields[field] != match[field] for field in MATCH_PARSERS):
+            report(f"{path}:{line_number}: match {row_key!r} changes {', '.join(MATCH_PARSERS)} mid-match")
+            valid = False
+
+        if game is None:
+            valid = False
+        elif valid:
+            match["games"].append(game)
+
+    if valid:
+        yield match
+
+
+def read_matches(paths, file_format, report):
+    for path in paths:
+        kind = file_format or ("csv" if path.lower().endswith(".csv") else "jsonl")
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                rows = read_csv(f) if kind == "csv" else read_jsonl(f)
+                yield from parse_matches(path, rows, report)
+        except (OSError, ValueError, csv.Error) as e:
+            report(f"{path}: {e}")
+
+
+def counted_batches(matches, imported, tally):
+    # Count (and, to update the cache, tally) the imported matches batch by
+    # batch as they stream to the writer, so neither side holds the whole
+    # import. The tallies of every batch add up in one Accumulator.
+    while True:
+        batch = list(islice(matches, CHUNK_MATCHES))
+        if not batch:
+            return
+        if tally:
+            imported.add(GameTable.from_data({"matches": batch}))
+        else:
+            imported.matches += len(batch)
+            imported.games += sum(len(match["games"]) for match in batch)
+        yield from batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import matches from CSV or JSON Lines files without prompts.")
+    parser.add_argument("user")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="file format (default: by file extension)")
+    parser.add_argument("--check", action="store_true", help="validate the files without importing anything")
+    args = parser.parse_args()
+
+    dirname = "data"
+    filename = f"{dirname}/{args.user}_stats.json"
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+
+    start = time.perf_counter()
+    errors = 0
+
+    def report(message):
+        # Errors are printed as they are found, so a bad file costs no memory.
+        nonlocal errors
+        errors += 1
+        print(message)
+
+    matches = read_matches(args.files, args.format, report)
+    imported = Accumulator()
+
+    if args.check:
+        count = sum(1 for _ in counted_batches(matches, imported, False))
+    else:
+        with writer_lock(filename):
+            base = fresh_cache(filename)
+            if uses_database(filename):
+                recorder = Database(database_filename(filename))
+            else:
+                recorder = Journal(filename)
+            # Readers wait for the whole batch rather than see part of it.
+            try:
+                with files_lock(filename):
+                    count = recorder.import_matches(counted_batches(matches, imported, base is not None))
+            finally:
+                recorder.close()
+            # Without a cache, stats_displayer.py rebuilds it on its next run.
+            if base is not None:
+                append_cache(filename, base, imported.aggregates())
+
+    action = "Validated" if args.check else f"Imported into {recorder.path}"
+    print(f"{action}: {count} matches, {imported.games} games, {errors} errors "
+          f"({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
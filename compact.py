@@ -0,0 +1,23 @@
+from aggregates import load_cache, save_cache
+from storage import compact, exists, writer_lock
+
+
+def main():
+    user = input("Enter username: ").strip()
+    filename = f"data/{user}_stats.json"
+
+    if not exists(filename):
+        print("Invalid user.")
+        return
+
+    with writer_lock(filename):
+        aggregates = load_cache(filename)
+        data = compact(filename)
+        if aggregates is not None and aggregates.matches == len(data["matches"]):
+            save_cache(filename, aggregates)
+
+    print(f"Journal compacted into {filename} ({len(data['matches'])} matches)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import json
+import os
+
+from aggregates import load_cache, save_cache
+from binary_storage import read_table, table_to_data
+from sqlite_storage import Database
+from storage import (atomic_path, binary_filename, database_filename, iter_matches, load_data, save_binary,
+                     save_snapshot, uses_binary, writer_lock)
+
+
+def main():
+    user = input("Enter username: ").strip()
+    filename = f"data/{user}_stats.json"
+    binary = binary_filename(filename)
+    database = database_filename(filename)
+
+    print("\nChoose a conversion:")
+    print(f"1. {filename} -> {binary}")
+    print(f"2. {binary} -> {filename}")
+    print(f"3. stats history -> {database}")
+    choice = input("Enter choice: ").strip()
+
+    with writer_lock(filename):
+        if choice == "3" and not os.path.exists(database):
+            matches = load_data(filename)["matches"] if uses_binary(filename) else iter_matches(filename)
+            aggregates = load_cache(filename)
+            # Readers switch to the database as soon as it exists, so it is built
+            # under a temporary name and only renamed into place once complete.
+            with atomic_path(database) as temp_database:
+                recorder = Database(temp_database)
+                try:
+                    count = recorder.import_matches(matches)
+                finally:
+                    recorder.close()
+            if aggregates is not None:
+                save_cache(filename, aggregates)
+            print(f"Imported {count} matches into {database}")
+            return
+
+        if choice == "1" and os.path.exists(filename):
+            with open(filename, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            target = binary
+        elif choice == "2" and os.path.exists(binary):
+            data = table_to_data(read_table(binary))
+            target = filename
+        else:
+            print("Invalid choice or missing source file.")
+            return
+
+        aggregates = load_cache(filename)
+        if target == binary:
+            save_binary(filename, data)
+        else:
+            save_snapshot(filename, data)
+        if aggregates is not None:
+            save_cache(filename, aggregates)
+
+        print(f"Converted {len(data['matches'])} matches into {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+class FPNode:
+    __slots__ = ("item", "parent", "children", "count", "wins")
+
+    def __init__(self, item, parent):
+        self.item = item
+        self.parent = parent
+        self.children = {}
+        self.count = 0
+        self.wins = 0
+
+
+def build_tree(transactions, min_count):
+    counts = {}
+    for items, count, _ in transactions:
+        for item in items:
+            counts[item] = counts.get(item, 0) + count
+    frequent = sorted((item for item in counts if counts[item] >= min_count), key=lambda item: (-counts[item], item))
+    if not frequent:
+        return frequent, {}
+    order = {item: index for index, item in enumerate(frequent)}
+
+    root = FPNode(None, None)
+    header = {item: [] for item in frequent}
+    for items, count, wins in transactions:
+        node = root
+        for item in sorted((item for item in items if item in order), key=order.get):
+            child = node.children.get(item)
+            if child is None:
+                child = node.children[item] = FPNode(item, node)
+                header[item].append(child)
+            child.count += count
+            child.wins += wins
+            node = child
+    return frequent, header
+
+
+def mine(transactions, min_count, suffix=(), results=None):
+    # FP-growth over weighted transactions of (items, games, wins). Each
+    # frequent itemset is reported once with its games and wins.
+    if results is None:
+        results = []
+    frequent, header = build_tree(transactions, min_count)
+    for item in reversed(frequent):
+        nodes = header[item]
+        itemset = (item,) + suffix
+        results.append((itemset, sum(node.count for node in nodes), sum(node.wins for node in nodes)))
+
+        conditional = []
+        for node in nodes:
+            path = []
+            parent = node.parent
+            while parent.item is not None:
+                path.append(parent.item)
+                parent = parent.parent
+            if path:
+                conditional.append((path, node.count, node.wins))
+        if conditional:
+            mine(conditional, min_count, itemset, results)
+    return results
@@ -0,0 +1,74 @@
+from collections import Counter
+
+
+def edit_distance(a, b):
+    # Levenshtein distance with Myers' bit-parallel algorithm: one column of the
+    # dynamic programming matrix per character of b, as bit vectors over a.
+    if not a:
+        return len(b)
+    masks = {}
+    for i, char in enumerate(a):
+        masks[char] = masks.get(char, 0) | 1 << i
+    full = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+
+    positive, negative, distance = full, 0, len(a)
+    for char in b:
+        equal = masks.get(char, 0)
+        vertical = equal | negative
+        horizontal = (((equal & positive) + positive) ^ positive) | equal
+        horizontal_positive = negative | ~(horizontal | positive) & full
+        horizontal_negative = positive & horizontal
+        if horizontal_positive & last:
+            distance += 1
+        elif horizontal_negative & last:
+            distance -= 1
+        horizontal_positive = (horizontal_positive << 1 | 1) & full
+        horizontal_negative = (horizontal_negative << 1) & full
+        positive = horizontal_negative | ~(vertical | horizontal_positive) & full
+        negative = horizontal_positive & vertical
+    return distance
+
+
+def bigrams(word):
+    padded = f"^{word}$"
+    return Counter(padded[i:i + 2] for i in range(len(padded) - 1))
+
+
+class NGramIndex:
+    # Bigram postings over the names. A name within k edits of the query
+    # shares at least max(length) + 1 - 2k padded bigrams with it, so only
+    # names passing that count are verified with the exact edit distance.
+    def __init__(self, names):
+        self.names = sorted(set(names))
+        self.postings = {}
+        for name_id, name in enumerate(self.names):
+            for gram, count in bigrams(name).items():
+                self.postings.setdefault(gram, []).extend([name_id] * count)
+
+    def search(self, word, max_distance):
+        threshold = len(word) + 1 - 2 * max_distance
+        if threshold <= 0:
+            candidates = range(len(self.names))
+        else:
+            # Counting query x name occurrences over-counts repeated bigrams,
+            # which only lets a few more names through to verification.
+            shared = Counter()
+            for gram, count in bigrams(word).items():
+                for _ in range(count):
+                    shared.update(self.postings.get(gram, ()))
+            candidates = [name_id for name_id, common in shared.items() if common >= threshold]
+
+        found = []
+        for name_id in candidates:
+            name = self.names[name_id]
+            if abs(len(name) - len(word)) <= max_distance:
+                distance = edit_distance(word, name)
+                if distance <= max_distance:
+                    found.append((distance, name))
+        return sorted(found)
+
+    def suggest(self, word, count=3):
+        # Allow more typos in longer names.
+        max_distance = 1 if len(word) <= 4 else 2 if len(word) <= 8 else 3
+        return [name for _, name in self.search(word, max_distance)[:count]]
@@ -0,0 +1,130 @@
+import numpy as np
+
+from vocabulary import hero_vocabulary, item_vocabulary
+
+
+def row_pairs(ptr, rows):
+    # Every pair of entries within one CSR row, as entry positions: the nonzero
+    # pattern of the co-occurrence product, row by row.
+    entries = np.arange(len(rows))
+    later = ptr[rows + 1] - entries - 1
+    first = np.repeat(entries, later)
+    starts = np.cumsum(later) - later
+    second = first + 1 + np.arange(len(first)) - np.repeat(starts, later)
+    return first, second
+
+
+class GameTable:
+    def __init__(self, heroes, item_names, result, opponent_rating, hero, opponent_hero,
+                 match_index, game_index, trophies, start_rating, end_rating, match_hero,
+                 item_ptr, item_ids, item_counts):
+        self.heroes = heroes
+        self.item_names = item_names
+        self.result = result
+        self.opponent_rating = opponent_rating
+        self.hero = hero
+        self.opponent_hero = opponent_hero
+        self.match_index = match_index
+        self.game_index = game_index
+        self.trophies = trophies
+        self.start_rating = start_rating
+        self.end_rating = end_rating
+        self.match_hero = match_hero
+        # Per-game item counts as a CSR matrix over item_names: the items of
+        # game i are item_ids[item_ptr[i]:item_ptr[i + 1]], in entry order.
+        self.item_ptr = item_ptr
+        self.item_ids = item_ids
+        self.item_counts = item_counts
+        self._item_rows = None
+
+    def __len__(self):
+        return len(self.result)
+
+    def chunks(self, matches_per_chunk):
+        for first in range(0, self.match_count, matches_per_chunk):
+            last = min(first + matches_per_chunk, self.match_count)
+            start, end = np.searchsorted(self.match_index, [first, last])
+            item_ptr = self.item_ptr[start:end + 1]
+            yield GameTable(
+                heroes=self.heroes,
+                item_names=self.item_names,
+                result=self.result[start:end],
+                opponent_rating=self.opponent_rating[start:end],
+                hero=self.hero[start:end],
+                opponent_hero=self.opponent_hero[start:end],
+                match_index=self.match_index[start:end] - first,
+                game_index=self.game_index[start:end],
+                trophies=self.trophies[start:end],
+                start_rating=self.start_rating[first:last],
+                end_rating=self.end_rating[first:last],
+                match_hero=self.match_hero[first:last],
+                item_ptr=item_ptr - item_ptr[0],
+                item_ids=self.item_ids[item_ptr[0]:item_ptr[-1]],
+                item_counts=self.item_counts[item_ptr[0]:item_ptr[-1]],
+            )
+
+    @property
+    def match_count(self):
+        return len(self.start_rating)
+
+    @property
+    def item_rows(self):
+        if self._item_rows is None:
+            self._item_rows = np.repeat(
+                np.arange(len(self), dtype=np.int32), np.diff(self.item_ptr))
+        return self._item_rows
+
+    def entry_pairs(self):
+        return row_pairs(self.item_ptr, self.item_rows)
+
+    @staticmethod
+    def from_data(data):
+        heroes = hero_vocabulary()
+        hero_id = heroes.id
+        items = item_vocabulary()
+        item_id = items.id
+
+        result, opponent_rating, hero, opponent_hero = [], [], [], []
+        match_index, game_index, trophies = [], [], []
+        start_rating, end_rating, match_hero = [], [], []
+        item_ptr, item_ids, item_counts = [0], [], []
+
+        for m, match in enumerate(data["matches"]):
+            start_rating.append(match["start_rating"])
+            end_rating.append(match["end_rating"])
+            own = hero_id(match["hero"])
+            match_hero.append(own)
+            wins = 0
+            for g, game in enumerate(match["games"]):
+                won = game["result"] == "W"
+                rating = game.get("opponent_rating")
+                result.append(won)
+                opponent_rating.append(np.nan if rating is None else rating)
+                hero.append(own)
+                opponent_hero.append(hero_id(game["opponent_hero"]))
+                match_index.append(m)
+                game_index.append(g)
+                trophies.append(wins)
+                for item, count in game["items"].items():
+                    item_ids.append(item_id(item))
+                    item_counts.append(count)
+                item_ptr.append(len(item_ids))
+                wins += won
+
+        return GameTable(
+            heroes=heroes.names,
+            item_names=items.names,
+            result=np.array(result, dtype=np.int8),
+            opponent_rating=np.array(opponent_rating, dtype=np.float64),
+            hero=np.array(hero, dtype=np.int16),
+            opponent_hero=np.array(opponent_hero, dtype=np.int16),
+            match_index=np.array(match_index, dtype=np.int32),
+            game_index=np.array(game_index, dtype=np.int16),
+            trophies=np.array(trophies, dtype=np.int16),
+            start_rating=np.array(start_rating, dtype=np.int64),
+            end_rating=np.array(end_rating, dtype=np.int64),
+            match_hero=np.array(match_hero, dtype=np.int16),
+            item_ptr=np.array(item_ptr, dtype=np.int64),
+            item_ids=np.array(item_ids, dtype=np.int16),
+            item_counts=np.array(item_counts, dtype=np.int32),
+        )
@@ -0,0 +1,42 @@
+import subprocess
+import sys
+
+BUDGET = 0.5
+RUNS = 5
+PLOTTING = ("matplotlib", "mplcursors")
+
+MEASURE = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(elapsed, any(name.split(".")[0] in {plotting!r} for name in sys.modules))
+"""
+
+
+def measure(statement):
+    timings = []
+    for _ in range(RUNS):
+        output = subprocess.run(
+            [sys.executable, "-c", MEASURE.format(statement=statement, plotting=PLOTTING)],
+            capture_output=True, text=True, check=True,
+        ).stdout.split()
+        timings.append(float(output[0]))
+    return min(timings), output[1] == "True"
+
+
+def main():
+    cold_start, plotting_loaded = measure("import stats_displayer")
+    first_display, _ = measure("import stats_displayer, stats; stats.load_plotting()")
+
+    print(f"Cold start (import stats_displayer): {cold_start:.3f}s, budget {BUDGET:.3f}s")
+    print(f"Cold start with the plotting stack (first display): {first_display:.3f}s")
+    print(f"Plotting stack imported at startup: {'yes' if plotting_loaded else 'no'}")
+
+    if plotting_loaded or cold_start > BUDGET:
+        print("Import-time budget exceeded.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
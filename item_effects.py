@@ -0,0 +1,133 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from game_table import row_pairs
+from storage import exists, load_table
+
+MIN_GAMES = 20
+PENALTY = 1.0
+MAX_ITERATIONS = 25
+TOLERANCE = 1e-6
+
+
+def design(table, min_games=MIN_GAMES):
+    # Dense columns: intercept, standardized opponent rating and a missing
+    # rating flag. Indicator columns, stored as CSR: every item present in at
+    # least min_games games, then own hero and opponent hero.
+    presence = np.bincount(table.item_ids, minlength=len(table.item_names))
+    kept = np.flatnonzero(presence >= min_games)
+    column = np.full(len(table.item_names), -1, dtype=np.int64)
+    column[kept] = np.arange(len(kept))
+    entries = column[table.item_ids] >= 0
+
+    games = np.arange(len(table))
+    rows = np.concatenate((table.item_rows[entries], games, games))
+    cols = np.concatenate((column[table.item_ids[entries]],
+                           len(kept) + table.hero.astype(np.int64),
+                           len(kept) + len(table.heroes) + table.opponent_hero.astype(np.int64)))
+    order = np.argsort(rows, kind="stable")
+    rows, cols = rows[order], cols[order]
+    ptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=len(table)))))
+
+    rating = np.asarray(table.opponent_rating, dtype=np.float64)
+    valid = np.isfinite(rating)
+    standardized = np.zeros(len(table))
+    if valid.any():
+        standardized[valid] = (rating[valid] - rating[valid].mean()) / (rating[valid].std() or 1)
+    dense = np.column_stack((np.ones(len(table)), standardized, ~valid))
+
+    names = ([table.item_names[item] for item in kept.tolist()]
+             + [f"hero: {hero}" for hero in table.heroes]
+             + [f"vs: {hero}" for hero in table.heroes])
+    return dense, rows, cols, ptr, names, presence[kept]
+
+
+def fit(dense, rows, cols, ptr, won, penalty=PENALTY):
+    # Ridge-penalized logistic regression by IRLS (Newton steps). The
+    # indicator block of X^T W X is the weighted co-occurrence product of the
+    # CSR indicators, accumulated over the pairs within every row.
+    games, d = dense.shape
+    m = int(cols.max()) + 1
+    first, second = row_pairs(ptr, rows)
+    low, high = np.minimum(cols[first], cols[second]), np.maximum(cols[first], cols[second])
+    pair_codes = low * m + high
+    pair_rows = rows[first]
+    del first, second, low, high
+
+    # The intercept is unpenalized; the other dense columns get a tiny ridge
+    # so that an all-zero column (no missing ratings) stays solvable.
+    ridge = np.concatenate(([0], np.full(d - 1, 1e-6), np.full(m, penalty)))
+    beta = np.zeros(d + m)
+    y = np.asarray(won, dtype=np.float64)
+
+    for iteration in range(1, MAX_ITERATIONS + 1):
+        eta = dense @ beta[:d] + np.bincount(rows, weights=beta[d:][cols], minlength=games)
+        probability = 1 / (1 + np.exp(-eta))
+        weights = probability * (1 - probability)
+        residual = y - probability
+
+        gradient = np.concatenate((dense.T @ residual, np.bincount(cols, residual[rows], m))) - ridge * beta
+        hessian = np.empty((d + m, d + m))
+        hessian[:d, :d] = dense.T @ (dense * weights[:, None])
+        hessian[d:, :d] = np.column_stack([np.bincount(cols, (weights * dense[:, j])[rows], m) for j in range(d)])
+        hessian[:d, d:] = hessian[d:, :d].T
+        cooccurrence = np.bincount(pair_codes, weights[pair_rows], m * m).reshape(m, m)
+        hessian[d:, d:] = cooccurrence + cooccurrence.T + np.diag(np.bincount(cols, weights[rows], m))
+        hessian[np.diag_indices(d + m)] += ridge
+
+        step = np.linalg.solve(hessian, gradient)
+        beta += step
+        if np.abs(step).max() < TOLERANCE:
+            break
+
+    errors = np.sqrt(np.diag(np.linalg.inv(hessian)))
+    return beta[d:], errors[d:], iteration
+
+
+def item_effects(table, min_games=MIN_GAMES, penalty=PENALTY):
+    dense, rows, cols, ptr, names, presence = design(table, min_games)
+    effects, errors, iterations = fit(dense, rows, cols, ptr, table.result, penalty)
+    # Only the item columns are reported; the hero columns are controls.
+    count = len(presence)
+    items = [{"item": name, "games": games, "effect": effect, "error": error, "z": effect / error}
+             for name, games, effect, error in zip(names[:count], presence.tolist(),
+                                                   effects[:count].tolist(), errors[:count].tolist())]
+    return sorted(items, key=lambda x: x["effect"], reverse=True), iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fit item effects on winning, controlling for heroes and opponent rating.")
+    parser.add_argument("user")
+    parser.add_argument("--min-games", type=int, default=MIN_GAMES, help=f"minimum games per item (default: {MIN_GAMES})")
+    parser.add_argument("--penalty", type=float, default=PENALTY, help=f"ridge penalty (default: {PENALTY})")
+    parser.add_argument("--top", type=int, default=20, help="items to print from each end (default: 20)")
+    parser.add_argument("--output", help="also write every effect to this JSON file")
+    args = parser.parse_args()
+
+    filename = f"data/{args.user}_stats.json"
+    if not exists(filename):
+        print("Invalid user.")
+        return
+
+    start = time.perf_counter()
+    table = load_table(filename)
+    effects, iterations = item_effects(table, args.min_games, args.penalty)
+    print(f"Fitted {len(table)} games in {iterations} iterations, {time.perf_counter() - start:.2f}s")
+
+    shown = effects if len(effects) <= 2 * args.top else effects[:args.top] + effects[-args.top:]
+    print(f"{'Item':<30} {'Games':>7} {'Log-odds':>9} {'Std. err':>9} {'z':>7}")
+    for effect in shown:
+        print(f"{effect['item']:<30} {effect['games']:>7} {effect['effect']:>9.3f} "
+              f"{effect['error']:>9.3f} {effect['z']:>7.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(effects, f, indent=4, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
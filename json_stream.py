@@ -0,0 +1,91 @@
+import json
+import re
+
+CHUNK_SIZE = 1 << 16
+WHITESPACE = " \t\n\r"
+# The rest of the buffer is a single unfinished number or literal such as
+# "6.5e" or "tru", which the next chunk may complete.
+TOKEN_TAIL = re.compile(r'[^\s,:\[\]{}"]*')
+
+
+def iter_array(f, key):
+    decoder = json.JSONDecoder()
+    buffer, pos, offset = "", 0, 0
+
+    def fill():
+        nonlocal buffer, pos, offset
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            raise ValueError(f"Unexpected end of JSON stream at offset {offset + len(buffer)}.")
+        offset += pos
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def peek():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            fill()
+
+    def expect(char):
+        nonlocal pos
+        if peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {offset + pos} of JSON stream.")
+        pos += 1
+
+    def value():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                result, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # Only a value cut off by the end of the buffer can be fixed by
+                # reading more; anything else is an error in the stream itself.
+                if e.pos < len(buffer) and not e.msg.startswith("Unterminated string") \
+                        and not TOKEN_TAIL.fullmatch(buffer, e.pos):
+                    raise ValueError(f"{e.msg} at offset {offset + e.pos} of JSON stream.") from None
+                fill()
+                continue
+            # A value ending at the buffer end, or a number followed only by
+            # the start of its fraction or exponent, may continue in the next chunk.
+            if not TOKEN_TAIL.fullmatch(buffer, end):
+                pos = end
+                return result
+            fill()
+
+    def elements(close):
+        # Yields once per element, checking the commas between elements.
+        nonlocal pos
+        if peek() == close:
+            pos += 1
+            return
+        while True:
+            yield
+            if peek() == close:
+                pos += 1
+                return
+            expect(",")
+
+    expect("{")
+    for _ in elements("}"):
+        if peek() != '"':
+            raise ValueError(f"Expected a property name at offset {offset + pos} of JSON stream.")
+        name = value()
+        expect(":")
+        if name != key:
+            value()
+            continue
+
+        expect("[")
+        for _ in elements("]"):
+            yield value()
+        return
+
+
+def iter_matches(filename):
+    with open(filename, "r", encoding="utf-8") as f:
+        yield from iter_array(f, "matches")
@@ -0,0 +1,95 @@
+import argparse
+import os
+import time
+from multiprocessing import Pool
+
+import stats
+from aggregates import Aggregates, load_cache, save_cache, source_signature
+from stats_displayer import available_stats
+from storage import exists
+
+BANDWIDTH_MODES = stats.AccurateWinRateByRating.BANDWIDTH_MODES
+worker_aggregates = None
+
+
+def load_headless_plotting():
+    import matplotlib
+    matplotlib.use("Agg")
+    stats.load_plotting()
+
+
+def init_worker(values):
+    global worker_aggregates
+    load_headless_plotting()
+    worker_aggregates = Aggregates.from_dict(values)
+
+
+def chart_tasks(output_dir, fmt):
+    os.makedirs(output_dir, exist_ok=True)
+    return [
+        (index, os.path.join(output_dir, f"{index + 1:02d}_{stat.__name__}.{fmt}"))
+        for index, stat in enumerate(available_stats)
+    ]
+
+
+def render_chart(aggregates, index, output, options):
+    stat = available_stats[index]
+    start = time.perf_counter()
+    try:
+        stat.display(aggregates, output=output, **options)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return stat.__name__, output, time.perf_counter() - start, error
+
+
+def render_in_worker(task):
+    return render_chart(worker_aggregates, *task)
+
+
+def render_all(aggregates, output_dir, fmt="png", processes=None, options=None):
+    tasks = [(index, output, options or {}) for index, output in chart_tasks(output_dir, fmt)]
+    # Forked workers inherit the already imported plotting stack.
+    load_headless_plotting()
+    with Pool(processes, initializer=init_worker, initargs=(aggregates.to_dict(),)) as pool:
+        return pool.map(render_in_worker, tasks, chunksize=1)
+
+
+def load_aggregates(filename):
+    aggregates = load_cache(filename)
+    if aggregates is None:
+        source = source_signature(filename)
+        aggregates = Aggregates.from_storage(filename)
+        save_cache(filename, aggregates, source)
+    return aggregates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render every statistic chart to image files.")
+    parser.add_argument("user")
+    parser.add_argument("--output", default="charts", help="output directory (default: charts)")
+    parser.add_argument("--format", default="png", choices=("png", "svg"))
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--bandwidth", default="fixed", choices=tuple(BANDWIDTH_MODES),
+                        help="rating curve bandwidth (default: fixed)")
+    args = parser.parse_args()
+
+    filename = f"data/{args.user}_stats.json"
+    if not exists(filename):
+        print("Invalid user.")
+        return
+
+    start = time.perf_counter()
+    results = render_all(load_aggregates(filename), args.output, args.format, args.processes,
+                         BANDWIDTH_MODES[args.bandwidth])
+    for name, output, seconds, error in results:
+        if error is None:
+            print(f"{name}: {output} ({seconds:.2f}s)")
+        else:
+            print(f"{name}: failed ({error})")
+    print(f"Rendered {sum(error is None for *_, error in results)}/{len(results)} charts "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
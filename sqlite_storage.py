@@ -0,0 +1,246 @@
+import math
+import os
+import sqlite3
+
+from constants import RELICS, UNIQUES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    start_rating INTEGER NOT NULL,
+    end_rating INTEGER NOT NULL,
+    hero TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    match_id INTEGER NOT NULL REFERENCES matches(id),
+    game_index INTEGER NOT NULL,
+    trophies INTEGER NOT NULL,
+    result INTEGER NOT NULL,
+    opponent_rating REAL,
+    opponent_hero TEXT NOT NULL,
+    hero TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS game_items (
+    id INTEGER PRIMARY KEY,
+    game_id INTEGER NOT NULL REFERENCES games(id),
+    item TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS saved_pending (
+    name TEXT PRIMARY KEY
+);
+CREATE INDEX IF NOT EXISTS matches_hero ON matches(hero);
+CREATE INDEX IF NOT EXISTS games_match ON games(match_id);
+CREATE INDEX IF NOT EXISTS games_opponent_hero ON games(opponent_hero, result);
+CREATE INDEX IF NOT EXISTS games_hero ON games(hero, opponent_hero);
+CREATE INDEX IF NOT EXISTS games_opponent_rating ON games(opponent_rating, result);
+CREATE INDEX IF NOT EXISTS game_items_item ON game_items(item, game_id);
+CREATE INDEX IF NOT EXISTS game_items_game ON game_items(game_id);
+"""
+
+
+def connect(path):
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    connection.execute("CREATE TEMP TABLE IF NOT EXISTS relics (item TEXT PRIMARY KEY)")
+    connection.execute("CREATE TEMP TABLE IF NOT EXISTS uniques (hero TEXT, item TEXT, PRIMARY KEY (hero, item))")
+    connection.executemany("INSERT OR IGNORE INTO relics VALUES (?)", [(item,) for item in RELICS])
+    connection.executemany("INSERT OR IGNORE INTO uniques VALUES (?, ?)",
+                           [(hero, item) for hero, items in UNIQUES.items() for item in items])
+    return connection
+
+
+class Database:
+    def __init__(self, path):
+        self.path = path
+        self.connection = connect(path)
+        self.match_id = None
+        self.hero = None
+        self.game_index = 0
+        self.trophies = 0
+
+    def insert_match(self, match):
+        cursor = self.connection.execute(
+            "INSERT INTO matches (start_rating, end_rating, hero) VALUES (?, ?, ?)",
+            (match["start_rating"], match["end_rating"], match["hero"]))
+        self.match_id = cursor.lastrowid
+        self.hero = match["hero"]
+        self.game_index = 0
+        self.trophies = 0
+
+    def insert_game(self, game):
+        won = game["result"] == "W"
+        cursor = self.connection.execute(
+            "INSERT INTO games (match_id, game_index, trophies, result, opponent_rating, opponent_hero, hero) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.match_id, self.game_index, self.trophies, won,
+             game.get("opponent_rating"), game["opponent_hero"], self.hero))
+        self.connection.executemany(
+            "INSERT INTO game_items (game_id, item, count) VALUES (?, ?, ?)",
+            [(cursor.lastrowid, item, count) for item, count in game["items"].items()])
+        self.game_index += 1
+        self.trophies += won
+
+    def append_match(self, match):
+        with self.connection:
+            self.insert_match(match)
+
+    def append_game(self, game):
+        with self.connection:
+            self.insert_game(game)
+
+    def import_matches(self, matches, pending=None):
+        # The name of a pending file is saved with its matches and forgotten
+        # once the file is removed, so a crash in between never saves them twice.
+        name = None if pending is None else os.path.basename(pending)
+        count = 0
+        with self.connection:
+            if name is None or not self.connection.execute(
+                    "SELECT 1 FROM saved_pending WHERE name = ?", (name,)).fetchone():
+                for match in matches:
+                    self.insert_match(match)
+                    for game in match["games"]:
+                        self.insert_game(game)
+                    count += 1
+                if name is not None:
+                    self.connection.execute("INSERT INTO saved_pending VALUES (?)", (name,))
+        if pending is not None:
+            os.remove(pending)
+            with self.connection:
+                self.connection.execute("DELETE FROM saved_pending WHERE name = ?", (name,))
+        return count
+
+    def close(self):
+        self.connection.close()
+
+
+def query_matches(connection):
+    items = connection.execute("SELECT game_id, item, count FROM game_items ORDER BY game_id, id")
+    item = items.fetchone()
+    match, match_id = None, None
+    for row_match_id, start_rating, end_rating, hero, game_id, result, rating, opponent_hero in connection.execute("""
+            SELECT m.id, m.start_rating, m.end_rating, m.hero, g.id, g.result, g.opponent_rating, g.opponent_hero
+            FROM matches m LEFT JOIN games g ON g.match_id = m.id ORDER BY m.id, g.id"""):
+        if row_match_id != match_id:
+            if match is not None:
+                yield match
+            match_id = row_match_id
+            match = {"start_rating": start_rating, "end_rating": end_rating, "hero": hero, "games": []}
+        if game_id is None:
+            continue
+
+        game_items = {}
+        while item is not None and item[0] <= game_id:
+            if item[0] == game_id:
+                game_items[item[1]] = item[2]
+            item = items.fetchone()
+        if rating is not None and rating.is_integer():
+            rating = int(rating)
+        match["games"].append({
+            "result": "W" if result else "L",
+            "opponent_rating": rating,
+            "opponent_hero": opponent_hero,
+            "items": game_items,
+        })
+    if match is not None:
+        yield match
+
+
+def game_filter(hero=None, opponent_hero=None, min_rating=None, max_rating=None):
+    conditions, parameters = [], []
+    for condition, value in (("g.hero = ?", hero), ("g.opponent_hero = ?", opponent_hero),
+                             ("g.opponent_rating >= ?", min_rating), ("g.opponent_rating <= ?", max_rating)):
+        if value is not None:
+            conditions.append(condition)
+            parameters.append(value)
+    return " AND ".join(conditions) or "1", parameters
+
+
+def query_tally(connection, query, parameters):
+    return {key: [games, wins] for key, games, wins in connection.execute(query, parameters)}
+
+
+def query_tallies(connection, **filters):
+    where, parameters = game_filter(**filters)
+    item_join = f"FROM game_items i JOIN games g ON g.id = i.game_id WHERE {where}"
+
+    tallies = {
+        "opponents": query_tally(connection, f"""
+            SELECT g.opponent_hero, COUNT(*), SUM(g.result) FROM games g WHERE {where}
+            GROUP BY g.opponent_hero ORDER BY MIN(g.id)""", parameters),
+        "items": query_tally(connection, f"""
+            SELECT i.item, SUM(i.count), SUM(i.count * g.result) {item_join}
+            GROUP BY i.item ORDER BY MIN(i.id)""", parameters),
+        "item_games": query_tally(connection, f"""
+            SELECT i.item, COUNT(*), SUM(g.result) {item_join}
+            GROUP BY i.item ORDER BY MIN(i.id)""", parameters),
+        "relics": query_tally(connection, f"""
+            SELECT i.item, COUNT(*), SUM(g.result) {item_join}
+            AND i.item IN (SELECT item FROM relics)
+            GROUP BY i.item ORDER BY MIN(i.id)""", parameters),
+        "uniques": query_tally(connection, f"""
+            SELECT i.item, COUNT(*), SUM(g.result) {item_join}
+            AND EXISTS (SELECT 1 FROM uniques u WHERE u.hero = g.hero AND u.item = i.item)
+            GROUP BY i.item ORDER BY MIN(i.id)""", parameters),
+        "game_numbers": query_tally(connection, f"""
+            SELECT g.game_index + 1, COUNT(*), SUM(g.result) FROM games g WHERE {where}
+            GROUP BY g.game_index""", parameters),
+        "trophies": query_tally(connection, f"""
+            SELECT g.trophies, COUNT(*), SUM(g.result) FROM games g WHERE {where}
+            GROUP BY g.trophies""", parameters),
+    }
+    # Pairs in order of first appearance: by the earlier entry, then the later
+    # one. Both entries of a pair's first game come before any of its later
+    # games, so the smallest later entry is the one of that first game.
+    pairs = connection.execute(f"""
+        SELECT a.item, b.item, COUNT(*), SUM(g.result) FROM game_items a
+        JOIN game_items b ON b.game_id = a.game_id AND a.item < b.item
+        JOIN games g ON g.id = a.game_id WHERE {where}
+        GROUP BY a.item, b.item ORDER BY MIN(MIN(a.id, b.id)), MIN(MAX(a.id, b.id))""", parameters)
+    tallies["item_pairs"] = {(first, second): [games, wins] for first, second, games, wins in pairs}
+    hero_items = connection.execute(f"""
+        SELECT g.hero, i.item, COUNT(*), SUM(g.result) {item_join}
+        GROUP BY g.hero, i.item ORDER BY MIN(i.id)""", parameters)
+    tallies["hero_items"] = {(hero, item): [games, wins] for hero, item, games, wins in hero_items}
+    item_copies = connection.execute(f"""
+        SELECT i.item, i.count, COUNT(*), SUM(g.result) {item_join}
+        GROUP BY i.item, i.count ORDER BY MIN(i.id)""", parameters)
+    tallies["item_copies"] = {(item, count): [games, wins] for item, count, games, wins in item_copies}
+    ratings = query_tally(connection, f"""
+        SELECT g.opponent_rating, COUNT(*), SUM(g.result) FROM games g
+        WHERE {where} AND g.opponent_rating IS NOT NULL
+        GROUP BY g.opponent_rating ORDER BY MIN(g.id)""", parameters)
+    tallies["ratings"] = {float(rating): counts for rating, counts in ratings.items() if math.isfinite(rating)}
+    return tallies
+
+
+def query_builds(connection, **filters):
+    where, parameters = game_filter(**filters)
+    games = connection.execute(f"""
+        SELECT g.hero, (SELECT GROUP_CONCAT(item, char(31)) FROM
+                        (SELECT item FROM game_items WHERE game_id = g.id ORDER BY item)),
+               g.result
+        FROM games g WHERE {where} ORDER BY g.id""", parameters)
+    builds = {}
+    for hero, items, won in games:
+        build = (hero,) + (tuple(items.split("\x1f")) if items else ())
+        counts = builds.setdefault(build, [0, 0])
+        counts[0] += 1
+        counts[1] += won
+    return builds
+
+
+def query_totals(connection, **filters):
+    where, parameters = game_filter(**filters)
+    games, wins = connection.execute(
+        f"SELECT COUNT(*), COALESCE(SUM(g.result), 0) FROM games g WHERE {where}", parameters).fetchone()
+    return games, wins
+
+
+def query_rating_series(connection, hero=None):
+    if hero is None:
+        rows = connection.execute("SELECT start_rating, end_rating FROM matches ORDER BY id")
+    else:
+        rows = connection.execute("SELECT start_rating, end_rating FROM matches WHERE hero = ? ORDER BY id", (hero,))
+    return [list(row) for row in rows]
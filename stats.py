@@ -1,53 +1,113 @@
-from collections import Counter
-from matplotlib import patheffects
-import matplotlib.cm as cm
-import matplotlib.pyplot as plt
-import mplcursors
 import numpy as np
 
-from constants import RANKS, RELICS, UNIQUES
+from bootstrap import CONFIDENCE, REPLICATES, tally_intervals
+from constants import RANKS
+from fpgrowth import mine
+
+# The plotting stack is slow to import, so it is only loaded by the first
+# display() call; the calculate_* methods work without it.
+cm = plt = mplcursors = patheffects = None
+
+
+def load_plotting():
+    global cm, plt, mplcursors, patheffects
+    if plt is None:
+        from matplotlib import patheffects
+        import matplotlib.cm as cm
+        import matplotlib.pyplot as plt
+        import mplcursors
+
+
+def show(output=None):
+    if output is None:
+        plt.show()
+    else:
+        plt.savefig(output)
+        plt.close("all")
+
+
+def error_bars(tally, keys, win_rates, kwargs, copies=None):
+    # Bootstrap confidence intervals, in percent, as matplotlib yerr.
+    if not kwargs.get("intervals", True):
+        return None
+    lower, upper = tally_intervals(tally, keys, copies, replicates=kwargs.get("replicates", REPLICATES),
+                                   confidence=kwargs.get("confidence", CONFIDENCE),
+                                   processes=kwargs.get("processes"))
+    win_rates = np.asarray(win_rates)
+    return np.maximum(0, [win_rates - lower * 100, upper * 100 - win_rates])
 
 
 class StatisticsFunction:
     description = ""
-    
+    # summary() reports what the calculate_* method named by summary_method
+    # returns, called with summary_options (keyword arguments and defaults).
+    # Keyed summaries map each of the first result's keys to its values in
+    # the other results, labelled when there are summary_labels; the others
+    # report each result under its label.
+    summary_method = None
+    summary_options = {}
+    summary_labels = ()
+    summary_keyed = True
+
+    @classmethod
+    def calculate_summary(cls, aggregates, **kwargs):
+        options = {name: kwargs.get(name, default) for name, default in cls.summary_options.items()}
+        return getattr(cls, cls.summary_method)(aggregates, **options)
+
+    @classmethod
+    def summary(cls, aggregates, **kwargs):
+        results = [result.tolist() if isinstance(result, np.ndarray) else result
+                   for result in cls.calculate_summary(aggregates, **kwargs)]
+        if not cls.summary_keyed:
+            return dict(zip(cls.summary_labels, results))
+        keys, *values = results
+        if not cls.summary_labels:
+            return dict(zip(keys, *values))
+        return {key: dict(zip(cls.summary_labels, row)) for key, *row in zip(keys, *values)}
+
     @staticmethod
-    def display(data):
+    def display(aggregates):
         raise NotImplementedError("Subclasses should implement this method.")
 
 
 
 class RatingProgress(StatisticsFunction):
     description = "Show rating progress"
+    summary_method = "calculate_ratings"
+    summary_labels = ("match", "rating")
+    summary_keyed = False
 
     @staticmethod
-    def calculate_ratings(data):
+    def calculate_ratings(aggregates):
         x_values, y_values = [], []
+        series = aggregates.rating_series
 
-        if data["matches"]: 
+        if series:
             x_values.append(0)
-            y_values.append(data["matches"][0]["start_rating"])
+            y_values.append(series[0][0])
             x_values.append(1)
-            y_values.append(data["matches"][0]["end_rating"])
+            y_values.append(series[0][1])
 
             x = 2
-            for i in range(1, len(data["matches"])):
-                if data["matches"][i - 1]["end_rating"] != data["matches"][i]["start_rating"]:
+            for i in range(1, len(series)):
+                if series[i - 1][1] != series[i][0]:
                     x_values.append(x - 0.5)
                     y_values.append(None)
                     x_values.append(x)
-                    y_values.append(data["matches"][i]["start_rating"])
+                    y_values.append(series[i][0])
                     x += 1
                 x_values.append(x)
-                y_values.append(data["matches"][i]["end_rating"])
+                y_values.append(series[i][1])
                 x += 1
 
         return x_values, y_values
 
     @staticmethod
-    def display(data, **kwargs):
-        x_values, y_values = RatingProgress.calculate_ratings(data)
-        min_rating, max_rating = min(y_values), max(y_values)
+    def display(aggregates, **kwargs):
+        load_plotting()
+        x_values, y_values = RatingProgress.calculate_ratings(aggregates)
+        ratings = [y for y in y_values if y is not None]
+        min_rating, max_rating = min(ratings), max(ratings)
 
         plt.style.use('seaborn-v0_8-darkgrid')
         fig, ax = plt.subplots(figsize=(10, 6))
@@ -95,40 +155,156 @@ class RatingProgress(StatisticsFunction):
             })
             sel.annotation.set_fontsize(10)
 
-        plt.show()
+        show(kwargs.get("output"))
 
 
 class AccurateWinRateByRating(StatisticsFunction):
     description = "Accurate win rate estimation by opponent rating"
+    summary_method = "calculate_win_probability"
+    summary_options = {"bandwidth": None, "adaptive": False, "select": False}
+    summary_labels = ("rating", "win_probability")
+    summary_keyed = False
+    # Distinct ratings above EXACT_LIMIT are binned onto BINS grid points.
+    EXACT_LIMIT = 20000
+    BINS = 2048
+    KERNEL_CHUNK = 4096
+    KERNEL_RADIUS = 5
+    # Bandwidths as fractions of the rating span: the default one, and the
+    # ones tried by cross-validation when select=True.
+    BANDWIDTH = 0.15
+    BANDWIDTHS = np.geomspace(0.01, 0.5, 40)
+    # The bandwidth choices of the menu and the --bandwidth flags, as options
+    # of calculate_win_probability.
+    BANDWIDTH_MODES = {"fixed": {}, "select": {"select": True}, "adaptive": {"adaptive": True}}
+    PRIOR_GAMES = 1
+
+    @staticmethod
+    def prepare_data(aggregates):
+        ratings = np.array(list(aggregates.ratings), dtype=np.float64)
+        counts = np.array(list(aggregates.ratings.values()), dtype=np.int64).reshape(-1, 2)
+        return ratings, counts[:, 0], counts[:, 1]
+
+    @staticmethod
+    def kernel_sums(ratings, values, x_values, bandwidth):
+        sums = np.zeros((len(x_values), values.shape[1]))
+        for start in range(0, len(ratings), AccurateWinRateByRating.KERNEL_CHUNK):
+            chunk = slice(start, start + AccurateWinRateByRating.KERNEL_CHUNK)
+            weights = np.exp(-0.5 * ((x_values[:, None] - ratings[None, chunk]) / bandwidth) ** 2)
+            sums += weights @ values[chunk]
+        return sums
+
+    @staticmethod
+    def bin_ratings(ratings, values, bins):
+        # Linear binning onto a regular grid; it does not depend on the bandwidth,
+        # so one binning serves every bandwidth tried.
+        grid = np.linspace(ratings.min(), ratings.max(), bins)
+        position = (ratings - grid[0]) / (grid[1] - grid[0])
+        left = np.minimum(position.astype(np.int64), bins - 2)
+        fraction = position - left
+        binned = np.stack([
+            np.bincount(left, values[:, column] * (1 - fraction), bins)
+            + np.bincount(left + 1, values[:, column] * fraction, bins)
+            for column in range(values.shape[1])
+        ], axis=1)
+        return grid, binned
 
     @staticmethod
-    def prepare_data(data):
-        ratings = []
-        results = []
-        for match in data["matches"]:
-            for game in match["games"]:
-                rating = game.get("opponent_rating")
-                if rating is None or not np.isfinite(rating):
-                    continue
-                ratings.append(float(rating))
-                results.append(1 if game.get("result") == "W" else 0)
+    def smooth_binned(grid, binned, x_values, bandwidth):
+        # Discrete Gaussian convolution; the error is of order (grid step / bandwidth) ** 2.
+        step = grid[1] - grid[0]
+        bins = len(grid)
+        radius = min(bins - 1, int(np.ceil(AccurateWinRateByRating.KERNEL_RADIUS * bandwidth / step)))
+        kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) * step / bandwidth) ** 2)
+        return np.stack([
+            np.interp(x_values, grid, np.convolve(binned[:, column], kernel)[radius:radius + bins])
+            for column in range(binned.shape[1])
+        ], axis=1)
 
-        return np.array(ratings), np.array(results)
+    @staticmethod
+    def binned_kernel_sums(ratings, values, x_values, bandwidth, bins):
+        grid, binned = AccurateWinRateByRating.bin_ratings(ratings, values, bins)
+        return AccurateWinRateByRating.smooth_binned(grid, binned, x_values, bandwidth)
 
     @staticmethod
-    def display(data, **kwargs):
-        ratings, results = AccurateWinRateByRating.prepare_data(data)
+    def adaptive_kernel_sums(ratings, values, x_values, bandwidth, bins):
+        # Balloon estimator: the bandwidth at each point scales with the inverse
+        # square root of the pilot game density there.
+        grid, binned = AccurateWinRateByRating.bin_ratings(ratings, values, bins)
+        pilot = AccurateWinRateByRating.smooth_binned(grid, binned[:, 1:], x_values, bandwidth)[:, 0]
+        pilot = np.maximum(pilot, pilot.max() * 1e-6)
+        local = bandwidth * np.sqrt(np.exp(np.mean(np.log(pilot))) / pilot)
+        weights = np.exp(-0.5 * ((x_values[:, None] - grid[None, :]) / local[:, None]) ** 2)
+        return weights @ binned
+
+    @staticmethod
+    def self_weights(grid, ratings, bandwidth):
+        # What one game at each rating contributes to the binned and smoothed
+        # sums at its own rating: its two linear-binning shares, each smoothed
+        # back onto both neighbouring grid points and interpolated.
+        step = grid[1] - grid[0]
+        position = (ratings - grid[0]) / step
+        fraction = position - np.minimum(position.astype(np.int64), len(grid) - 2)
+        neighbour = np.exp(-0.5 * (step / bandwidth) ** 2)
+        return (1 - fraction) ** 2 + fraction ** 2 + 2 * fraction * (1 - fraction) * neighbour
+
+    @staticmethod
+    def select_bandwidth(ratings, games, wins, bins=None):
+        values = np.stack([wins, games], axis=1).astype(np.float64)
+        grid, binned = AccurateWinRateByRating.bin_ratings(ratings, values, bins or AccurateWinRateByRating.BINS)
+        losses = games - wins
+
+        best_bandwidth, best_score = None, -np.inf
+        for bandwidth in AccurateWinRateByRating.BANDWIDTHS * (grid[-1] - grid[0]):
+            sums = AccurateWinRateByRating.smooth_binned(grid, binned, ratings, bandwidth)
+            own = AccurateWinRateByRating.self_weights(grid, ratings, bandwidth)
+            # Leave-one-game-out probabilities, shrunk towards 0.5 by PRIOR_GAMES
+            # so that isolated games do not reward a vanishing bandwidth.
+            others = sums[:, 1] - own + AccurateWinRateByRating.PRIOR_GAMES
+            prior_wins = 0.5 * AccurateWinRateByRating.PRIOR_GAMES
+            win_probability = np.clip((sums[:, 0] - own + prior_wins) / others, 1e-9, 1)
+            loss_probability = np.clip(1 - (sums[:, 0] + prior_wins) / others, 1e-9, 1)
+            score = wins @ np.log(win_probability) + losses @ np.log(loss_probability)
+            if score > best_score:
+                best_bandwidth, best_score = bandwidth, score
+        return best_bandwidth
+
+    @staticmethod
+    def calculate_win_probability(aggregates, points=100, bins=None, bandwidth=None, adaptive=False, select=False):
+        ratings, games, wins = AccurateWinRateByRating.prepare_data(aggregates)
+        low, high = ratings.min(), ratings.max()
+        x_values = np.linspace(low, high, points)
+        values = np.stack([wins, games], axis=1).astype(np.float64)
+        if high == low:
+            return x_values, np.full(points, wins.sum() / games.sum())
+
+        if bandwidth is None and select:
+            bandwidth = AccurateWinRateByRating.select_bandwidth(ratings, games, wins, bins)
+        elif bandwidth is None:
+            bandwidth = AccurateWinRateByRating.BANDWIDTH * (high - low)
+        if bins is None and len(ratings) > AccurateWinRateByRating.EXACT_LIMIT:
+            bins = AccurateWinRateByRating.BINS
+
+        if adaptive:
+            sums = AccurateWinRateByRating.adaptive_kernel_sums(
+                ratings, values, x_values, bandwidth, bins or AccurateWinRateByRating.BINS)
+        elif bins is None:
+            sums = AccurateWinRateByRating.kernel_sums(ratings, values, x_values, bandwidth)
+        else:
+            sums = AccurateWinRateByRating.binned_kernel_sums(ratings, values, x_values, bandwidth, bins)
+
+        return x_values, sums[:, 0] / sums[:, 1]
+
+    @staticmethod
+    def display(aggregates, **kwargs):
+        load_plotting()
+        ratings, games, wins = AccurateWinRateByRating.prepare_data(aggregates)
 
         plt.figure(figsize=(14, 7))
         plt.style.use('seaborn-v0_8-darkgrid')
 
-        x_values = np.linspace(min(ratings), max(ratings), 100)
-
-        winrates = []
-        for x in x_values:
-            weights = np.exp(-0.5*((ratings - x)/(0.15*(max(ratings)-min(ratings))))**2)
-            winrates.append(np.average(results, weights=weights))
-        winrates = np.array(winrates)
+        x_values, winrates = AccurateWinRateByRating.calculate_win_probability(
+            aggregates, bandwidth=kwargs.get("bandwidth"), adaptive=kwargs.get("adaptive", False),
+            select=kwargs.get("select", False))
 
         plt.plot(x_values, winrates, color='#3a86ff', linewidth=3, label='Win probability')
 
@@ -141,28 +317,21 @@ class AccurateWinRateByRating(StatisticsFunction):
         plt.grid(True, alpha=0.3)
 
         ax2 = plt.gca().twinx()
-        ax2.hist(ratings, bins=20, color='gray', alpha=0.2)
+        ax2.hist(ratings, bins=20, weights=games, color='gray', alpha=0.2)
         ax2.set_ylabel('Game count', fontsize=12)
 
         plt.tight_layout()
-        plt.show()
+        show(kwargs.get("output"))
 
 
 class OpponentHeroDistribution(StatisticsFunction):
     description = "Show distribution of opponent heroes"
+    summary_method = "calculate_games"
+    summary_options = {"min_games": 5}
 
     @staticmethod
-    def calculate_games(data, min_games):
-        game_counts = {}
-
-        for match in data["matches"]:
-            for game in match["games"]:
-                opponent = game["opponent_hero"]
-                if opponent not in game_counts:
-                    game_counts[opponent] = 0
-                game_counts[opponent] += 1
-
-        filtered_counts = {hero: count for hero, count in game_counts.items() if count >= min_games}
+    def calculate_games(aggregates, min_games):
+        filtered_counts = {hero: games for hero, (games, _) in aggregates.opponents.items() if games >= min_games}
         sorted_counts = sorted(filtered_counts.items(), key=lambda x: x[1], reverse=True)
         heroes, games = zip(*sorted_counts)
 
@@ -170,9 +339,10 @@ class OpponentHeroDistribution(StatisticsFunction):
 
 
     @staticmethod
-    def display(data, **kwargs):
+    def display(aggregates, **kwargs):
+        load_plotting()
         min_games = kwargs.get("min_games", 5)
-        heroes, games = OpponentHeroDistribution.calculate_games(data, min_games)
+        heroes, games = OpponentHeroDistribution.calculate_games(aggregates, min_games)
 
         plt.style.use('seaborn-v0_8-dark')
         plt.rcParams['font.family'] = 'DejaVu Sans'
@@ -234,38 +404,28 @@ class OpponentHeroDistribution(StatisticsFunction):
         )
 
         plt.tight_layout()
-        plt.show()
+        show(kwargs.get("output"))
 
 
 class WinRateVsHeroStatistics(StatisticsFunction):
     description = "Show win rate against each opponent hero"
+    summary_method = "calculate_win_rates"
+    summary_options = {"min_games": 5}
 
     @staticmethod
-    def calculate_win_rates(data, min_games):
-        win_counts = {}
-        game_counts = {}
-
-        for match in data["matches"]:
-            for game in match["games"]:
-                opponent = game["opponent_hero"]
-                if opponent not in game_counts:
-                    game_counts[opponent] = 0
-                    win_counts[opponent] = 0
-                game_counts[opponent] += 1
-                if game["result"] == "W":
-                    win_counts[opponent] += 1
-
-        win_rates = [(hero, win_counts[hero] / game_counts[hero])
-                     for hero in game_counts if game_counts[hero] >= min_games]
+    def calculate_win_rates(aggregates, min_games):
+        win_rates = [(hero, wins / games)
+                     for hero, (games, wins) in aggregates.opponents.items() if games >= min_games]
         sorted_win_rates = sorted(win_rates, key=lambda x: x[1], reverse=True)
         opponent_heroes, win_rates = zip(*sorted_win_rates)
 
         return opponent_heroes, win_rates
 
     @staticmethod
-    def display(data, **kwargs):
+    def display(aggregates, **kwargs):
+        load_plotting()
         min_games = kwargs.get("min_games", 5)
-        opponent_heroes, win_rates = WinRateVsHeroStatistics.calculate_win_rates(data, min_games)
+        opponent_heroes, win_rates = WinRateVsHeroStatistics.calculate_win_rates(aggregates, min_games)
 
         win_rates = [win_rate * 100 for win_rate in win_rates]
         x_values = range(len(opponent_heroes))
@@ -276,7 +436,8 @@ class WinRateVsHeroStatistics(StatisticsFunction):
         cmap = cm.get_cmap('RdYlGn')
         norm = plt.Normalize(vmin=0, vmax=100)
 
-        bars = plt.bar(x_values, win_rates, color=cmap(norm(win_rates)), edgecolor='black')
+        yerr = error_bars(aggregates.opponents, opponent_heroes, win_rates, kwargs)
+        bars = plt.bar(x_values, win_rates, yerr=yerr, capsize=2, color=cmap(norm(win_rates)), edgecolor='black')
 
         plt.xticks(x_values, opponent_heroes, rotation=45, ha="right")
         plt.ylabel("Win Rate")
@@ -299,38 +460,29 @@ class WinRateVsHeroStatistics(StatisticsFunction):
             })
             sel.annotation.set_fontsize(10)
 
-        plt.show()
+        show(kwargs.get("output"))
 
 
 class ItemUsageStatistics(StatisticsFunction):
     description = "Show item usage statistics"
+    summary_method = "calculate_usage"
+    summary_options = {"k": 30}
+    summary_labels = ("wins", "losses")
 
     @staticmethod
-    def calculate_usage(data, k):
-        total_usage = Counter()
-        win_usage = Counter()
-        loss_usage = Counter()
-
-        for match in data["matches"]:
-            for game in match["games"]:
-                result = game["result"]
-                for item, count in game["items"].items():
-                    total_usage[item] += count
-                    if result == "W":
-                        win_usage[item] += count
-                    else:
-                        loss_usage[item] += count
-
-        top_items = [item for item, _ in total_usage.most_common(k)]
-        win_counts = [win_usage[item] for item in top_items]
-        loss_counts = [loss_usage[item] for item in top_items]
+    def calculate_usage(aggregates, k):
+        top = sorted(aggregates.items.items(), key=lambda x: x[1][0], reverse=True)[:k]
+        top_items = [item for item, _ in top]
+        win_counts = [wins for _, (_, wins) in top]
+        loss_counts = [games - wins for _, (games, wins) in top]
 
         return top_items, win_counts, loss_counts
 
     @staticmethod
-    def display(data, **kwargs):
+    def display(aggregates, **kwargs):
+        load_plotting()
         k = kwargs.get("k", 30)
-        top_items, win_counts, loss_counts = ItemUsageStatistics.calculate_usage(data, k)
+        top_items, win_counts, loss_counts = ItemUsageStatistics.calculate_usage(aggregates, k)
 
         x_values = range(len(top_items))
 
@@ -375,38 +527,29 @@ class ItemUsageStatistics(StatisticsFunction):
                     )
                     return
 
-        plt.show()
+        show(kwargs.get("output"))
 
 
 class ItemBinaryUsageStatistics(StatisticsFunction):
     description = "Show item usage (binary per game) statistics"
+    summary_method = "calculate_usage"
+    summary_options = {"k": 30}
+    summary_labels = ("wins", "losses")
 
     @staticmethod
-    def calculate_usage(data, k):
-        total_usage = Counter()
-        win_usage = Counter()
-        loss_usage = Counter()
-
-        for match in data["matches"]:
-            for game in match["games"]:
-                result = game["result"]
-                for item in game["items"]:
-                    total_usage[item] += 1
-                    if result == "W":
-                        win_usage[item] += 1
-                    else:
-                        loss_usage[item] += 1
-
-        top_items = [item for item, _ in total_usage.most_common(k)]
-        win_counts = [win_usage[item] for item in top_items]
-        loss_counts = [loss_usage[item] for item in top_items]
+    def calculate_usage(aggregates, k):
+        top = sorted(aggregates.item_games.items(), key=lambda x: x[1][0], reverse=True)[:k]
+        top_items = [item for item, _ in top]
+        win_counts = [wins for _, (_, wins) in top]
+        loss_counts = [games - wins for _, (games, wins) in top]
 
         return top_items, win_counts, loss_counts
 
     @staticmethod
-    def display(data, **kwargs):
+    def display(aggregates, **kwargs):
+        load_plotting()
         k = kwargs.get("k", 30)
-        top_items, win_counts, loss_counts = ItemBinaryUsageStatistics.calculate_usage(data, k)
+        top_items, win_counts, loss_counts = ItemBinaryUsageStatistics.calculate_usage(aggregates, k)
 
         x_values = range(len(top_items))
 
@@ -451,40 +594,29 @@ class ItemBinaryUsageStatistics(StatisticsFunction):
                     )
                     return
 
-        plt.show()
+        show(kwargs.get("output"))
 
 
 class ItemWinRateStatistics(StatisticsFunction):
     description = "Show top items by win rate"
+    summary_method = "calculate_win_rates"
+    summary_options = {"k": 30, "min_games": 20}
 
     @staticmethod
-    def calculate_win_rates(data, k, min_games):
-        game_counts = {}
-        win_counts = {}
-
-        for match in data["matches"]:
-            for game in match["games"]:
-                result = game["result"]
-                for item, count in game["items"].items():
-                    if item not in game_counts:
-                        win_counts[item] = 0
-                        game_counts[item] = 0
-                    game_counts[item] += count
-                    if result == "W":
-                        win_counts[item] += count
-
-        win_rates = [(item, win_counts[item] / game_counts[item]) 
-                     for item in win_counts if game_counts[item] >= min_games]
+    def calculate_win_rates(aggregates, k, min_games):
+        win_rates = [(item, wins / games)
+                     for item, (games, wins) in aggregates.items.items() if games >= min_games]
         sorted_win_rates = sorted(win_rates, key=lambda x: x[1], reverse=True)
         items, win_rates = zip(*sorted_win_rates[:k])
 
         return items, win_rates
 
     @staticmethod
-    def display(data, **kwargs):
+    def display(aggregates, **kwargs):
+        load_plotting()
         k = kwargs.get("k", 30)
         min_games = kwargs.get("min_games", 20)
-        items, win_rates = ItemWinRateStatistics.calculate_win_rates(data, k, min_games)
+        items, win_rates = ItemWinRateStatistics.calculate_win_rates(aggregates, k, min_games)
 
         win_rates = [win_rate * 100 for win_rate in win_rates]
         x_values = range(len(items))
@@ -495,7 +627,8 @@ class ItemWinRateStatistics(StatisticsFunction):
         cmap = cm.get_cmap('RdYlGn')
         norm = plt.Normalize(vmin=0, vmax=100)
 
-        bars = plt.bar(x_values, win_rates, color=cmap(norm(win_rates)), edgecolor='black')
+        yerr = error_bars(aggregates.items, items, win_rates, kwargs, aggregates.item_copies)
+        bars = plt.bar(x_values, win_rates, yerr=yerr, capsize=2, color=cmap(norm(win_rates)), edgecolor='black')
 
         plt.xticks(x_values, items, rotation=45, ha="right")
         plt.ylabel("Win Rate")
@@ -518,40 +651,29 @@ class ItemWinRateStatistics(StatisticsFunction):
             })
             sel.annotation.set_fontsize(10)
 
-        plt.show()
+        show(kwargs.get("output"))
 
 
 class ItemBinaryWinRateStatistics(StatisticsFunction):
     description = "Show top items by win rate (binary per game)"
+    summary_method = "calculate_win_rates"
+    summary_options = {"k": 30, "min_games": 20}
 
     @staticmethod
-    def calculate_win_rates(data, k, min_games):
-        game_counts = {}
-        win_counts = {}
-
-        for match in data["matches"]:
-            for game in match["games"]:
-                result = game["result"]
-                for item in game["items"]:
-                    if item not in game_counts:
-                        game_counts[item] = 0
-                        win_counts[item] = 0
-                    game_counts[item] += 1
-                    if result == "W":
-                        win_counts[item] += 1
-
-        win_rates = [(item, win_counts[item] / game_counts[item]) 
-                     for item in win_counts if game_counts[item] >= min_games]
+    def calculate_win_rates(aggregates, k, min_games):
+        win_rates = [(item, wins / games)
+                     for item, (games, wins) in aggregates.item_games.items() if games >= min_games]
         sorted_win_rates = sorted(win_rates, key=lambda x: x[1], reverse=True)
         items, win_rates = zip(*sorted_win_rates[:k])
 
         return items, win_rates
 
     @staticmethod
-    def display(data, **kwargs):
+    def display(aggregates, **kwargs):
+        load_plotting()
         k = kwargs.get("k", 30)
         min_games = kwargs.get("min_games", 20)
-        items, win_rates = ItemBinaryWinRateStatistics.calculate_win_rates(data, k, min_games)
+        items, win_rates = ItemBinaryWinRateStatistics.calculate_win_rates(aggregates, k, min_games)
 
         win_rates = [win_rate * 100 for win_rate in win_rates]
         x_values = range(len(items))
@@ -562,7 +684,8 @@ class ItemBinaryWinRateStatistics(StatisticsFunction):
         cmap = cm.get_cmap('RdYlGn')
         norm = plt.Normalize(vmin=0, vmax=100)
 
-        bars = plt.bar(x_values, win_rates, color=cmap(norm(win_rates)), edgecolor='black')
+        yerr = error_bars(aggregates.item_games, items, win_rates, kwargs)
+        bars = plt.bar(x_values, win_rates, yerr=yerr, capsize=2, color=cmap(norm(win_rates)), edgecolor='black')
 
         plt.xticks(x_values, items, rotation=45, ha="right")
         plt.ylabel("Win Rate (binary per game)")
@@ -585,40 +708,28 @@ class ItemBinaryWinRateStatistics(StatisticsFunction):
             })
             sel.annotation.set_fontsize(10)
 
-        plt.show()
+        show(kwargs.get("output"))
 
 
 class RelicWinRateStatistics(StatisticsFunction):
     description = "Show win rate for each relic"
+    summary_method = "calculate_win_rates"
+    summary_options = {"min_games": 20}
 
     @staticmethod
-    def calculate_win_rates(data, min_games):
-        game_counts = {}
-        win_counts = {}
-
-        for match in data["matches"]:
-            for game in match["games"]:
-                result = game["result"]
-                for item in game["items"]:
-                    if item in RELICS:
-                        if item not in game_counts:
-                            win_counts[item] = 0
-                            game_counts[item] = 0
-                        game_counts[item] += 1
-                        if result == "W":
-                            win_counts[item] += 1
-
-        win_rates = [(item, win_counts[item] / game_counts[item]) 
-                     for item in win_counts if game_counts[item] >= min_games]
+    def calculate_win_rates(aggregates, min_games):
+        win_rates = [(item, wins / games)
+                     for item, (games, wins) in aggregates.relics.items() if games >= min_games]
         sorted_win_rates = sorted(win_rates, key=lambda x: x[1], reverse=True)
         relics, win_rates = zip(*sorted_win_rates)
 
         return relics, win_rates
 
     @staticmethod
-    def display(data, **kwargs):
+    def display(aggregates, **kwargs):
+        load_plotting()
         min_games = kwargs.get("min_games", 20)
-        relics, win_rates = RelicWinRateStatistics.calculate_win_rates(data, min_games)
+        relics, win_rates = RelicWinRateStatistics.calculate_win_rates(aggregates, min_games)
 
         win_rates = [win_rate * 100 for win_rate in win_rates]
         x_values = range(len(relics))
@@ -629,7 +740,8 @@ class RelicWinRateStatistics(StatisticsFunction):
         cmap = cm.get_cmap('RdYlGn')
         norm = plt.Normalize(vmin=0, vmax=100)
 
-        bars = plt.bar(x_values, win_rates, color=cmap(norm(win_rates)), edgecolor='black')
+        yerr = error_bars(aggregates.relics, relics, win_rates, kwargs)
+        bars = plt.bar(x_values, win_rates, yerr=yerr, capsize=2, color=cmap(norm(win_rates)), edgecolor='black')
 
         plt.xticks(x_values, relics, rotation=45, ha="right")
         plt.ylabel("Win Rate")
@@ -652,40 +764,28 @@ class RelicWinRateStatistics(StatisticsFunction):
             })
             sel.annotation.set_fontsize(10)
 
-        plt.show()
+        show(kwargs.get("output"))
 
 
 class UniqueWinRateStatistics(StatisticsFunction):
     description = "Show win rate for each unique item"
+    summary_method = "calculate_win_rates"
+    summary_options = {"min_games": 20}
 
     @staticmethod
-    def calculate_win_rates(data, min_games):
-        game_counts = {}
-        win_counts = {}
-
-        for match in data["matches"]:
-            for game in match["games"]:
-                result = game["result"]
-                for item in game["items"]:
-                    if item in UNIQUES[match["hero"]]:
-                        if item not in game_counts:
-                            win_counts[item] = 0
-                            game_counts[item] = 0
-                        game_counts[item] += 1
-                        if result == "W":
-                            win_counts[item] += 1
-
-        win_rates = [(item, win_counts[item] / game_counts[item]) 
-                     for item in win_counts if game_counts[item] >= min_games]
+    def calculate_win_rates(aggregates, min_games):
+        win_rates = [(item, wins / games)
+                     for item, (games, wins) in aggregates.uniques.items() if games >= min_games]
         sorted_win_rates = sorted(win_rates, key=lambda x: x[1], reverse=True)
         relics, win_rates = zip(*sorted_win_rates)
 
         return relics, win_rates
 
     @staticmethod
-    def display(data, **kwargs):
+    def display(aggregates, **kwargs):
+        load_plotting()
         min_games = kwargs.get("min_games", 20)
-        relics, win_rates = UniqueWinRateStatistics.calculate_win_rates(data, min_games)
+        relics, win_rates = UniqueWinRateStatistics.calculate_win_rates(aggregates, min_games)
 
         win_rates = [win_rate * 100 for win_rate in win_rates]
         x_values = range(len(relics))
@@ -696,7 +796,8 @@ class UniqueWinRateStatistics(StatisticsFunction):
         cmap = cm.get_cmap('RdYlGn')
         norm = plt.Normalize(vmin=0, vmax=100)
 
-        bars = plt.bar(x_values, win_rates, color=cmap(norm(win_rates)), edgecolor='black')
+        yerr = error_bars(aggregates.uniques, relics, win_rates, kwargs)
+        bars = plt.bar(x_values, win_rates, yerr=yerr, capsize=2, color=cmap(norm(win_rates)), edgecolor='black')
 
         plt.xticks(x_values, relics, rotation=45, ha="right")
         plt.ylabel("Win Rate")
@@ -719,37 +820,26 @@ class UniqueWinRateStatistics(StatisticsFunction):
             })
             sel.annotation.set_fontsize(10)
 
-        plt.show()
+        show(kwargs.get("output"))
 
 
 class GameWinRateStatistics(StatisticsFunction):
     description = "Show win rate by game number inside match"
+    summary_method = "calculate_win_rates"
 
     @staticmethod
-    def calculate_win_rates(data, min_games=5):
-        win_counts = {}
-        game_counts = {}
-
-        for match in data["matches"]:
-            for i, game in enumerate(match["games"]):
-                game_num = i + 1
-                if game_num not in game_counts:
-                    game_counts[game_num] = 0
-                    win_counts[game_num] = 0
-                game_counts[game_num] += 1
-                if game["result"] == "W":
-                    win_counts[game_num] += 1
-
-        win_rates = [(game_num, win_counts[game_num] / game_counts[game_num])
-                     for game_num in game_counts]
+    def calculate_win_rates(aggregates, min_games=5):
+        win_rates = [(game_num, wins / games)
+                     for game_num, (games, wins) in aggregates.game_numbers.items()]
         sorted_win_rates = sorted(win_rates, key=lambda x: x[0])
         games, win_rates = zip(*sorted_win_rates)
 
         return games, win_rates
 
     @staticmethod
-    def display(data, **kwargs):
-        games, win_rates = GameWinRateStatistics.calculate_win_rates(data)
+    def display(aggregates, **kwargs):
+        load_plotting()
+        games, win_rates = GameWinRateStatistics.calculate_win_rates(aggregates)
 
         win_rates = [win_rate * 100 for win_rate in win_rates]
         x_values = range(len(games))
@@ -761,7 +851,8 @@ class GameWinRateStatistics(StatisticsFunction):
         norm = plt.Normalize(vmin=0, vmax=100)
         colors = cmap(norm(win_rates))
 
-        bars = plt.bar(x_values, win_rates, color=colors, edgecolor='black')
+        yerr = error_bars(aggregates.game_numbers, games, win_rates, kwargs)
+        bars = plt.bar(x_values, win_rates, yerr=yerr, capsize=2, color=colors, edgecolor='black')
 
         plt.xticks(x_values, [str(i) for i in games])
         plt.ylabel("Win Rate (%)")
@@ -784,38 +875,26 @@ class GameWinRateStatistics(StatisticsFunction):
             })
             sel.annotation.set_fontsize(10)
 
-        plt.show()
+        show(kwargs.get("output"))
 
 
 class TrophyWinRateStatistics(StatisticsFunction):
     description = "Show win rate by trophy count in match"
+    summary_method = "calculate_win_rates"
 
     @staticmethod
-    def calculate_win_rates(data):
-        win_counts = {}
-        trophy_counts = {}
-
-        for match in data["matches"]:
-            trophies = 0
-            for game in match["games"]:
-                if trophies not in trophy_counts:
-                    trophy_counts[trophies] = 0
-                    win_counts[trophies] = 0
-                trophy_counts[trophies] += 1
-                if game["result"] == "W":
-                    win_counts[trophies] += 1
-                    trophies += 1
-
-        win_rates = [(trophies, win_counts[trophies] / trophy_counts[trophies])
-                     for trophies in trophy_counts]
+    def calculate_win_rates(aggregates):
+        win_rates = [(trophies, wins / games)
+                     for trophies, (games, wins) in aggregates.trophies.items()]
         sorted_win_rates = sorted(win_rates, key=lambda x: x[0])
         trophies, win_rates = zip(*sorted_win_rates)
 
         return trophies, win_rates
 
     @staticmethod
-    def display(data, **kwargs):
-        trophies, win_rates = TrophyWinRateStatistics.calculate_win_rates(data)
+    def display(aggregates, **kwargs):
+        load_plotting()
+        trophies, win_rates = TrophyWinRateStatistics.calculate_win_rates(aggregates)
 
         win_rates = [win_rate * 100 for win_rate in win_rates]
         x_values = range(len(trophies))
@@ -827,7 +906,8 @@ class TrophyWinRateStatistics(StatisticsFunction):
         norm = plt.Normalize(vmin=0, vmax=100)
         colors = cmap(norm(win_rates))
 
-        bars = plt.bar(x_values, win_rates, color=colors, edgecolor='black')
+        yerr = error_bars(aggregates.trophies, trophies, win_rates, kwargs)
+        bars = plt.bar(x_values, win_rates, yerr=yerr, capsize=2, color=colors, edgecolor='black')
 
         plt.xticks(x_values, [str(i) for i in trophies])
         plt.ylabel("Win Rate (%)")
@@ -850,39 +930,25 @@ class TrophyWinRateStatistics(StatisticsFunction):
             })
             sel.annotation.set_fontsize(10)
 
-        plt.show()
+        show(kwargs.get("output"))
 
 
 class SmartItemWinRateStatistics(StatisticsFunction):
     description = "Show top items by advanced effectiveness metrics"
+    summary_method = "calculate_metrics"
+    summary_options = {"k": 30, "min_games": 20}
+    summary_labels = ("items", "overall_win_rate")
+    summary_keyed = False
 
     @staticmethod
-    def calculate_metrics(data, k=30, min_games=20):
-        total_games = sum(len(match["games"]) for match in data["matches"])
-        total_wins = sum(1 for match in data["matches"] for game in match["games"] if game["result"] == "W")
-        overall_win_rate = total_wins / total_games
-
-        game_counts = {}
-        win_counts = {}
-
-        for match in data["matches"]:
-            for game in match["games"]:
-                result = game["result"]
-                for item, count in game["items"].items():
-                    if item not in game_counts:
-                        win_counts[item] = 0
-                        game_counts[item] = 0
-                    game_counts[item] += count
-                    if result == "W":
-                        win_counts[item] += count
+    def calculate_metrics(aggregates, k=30, min_games=20):
+        overall_win_rate = aggregates.wins / aggregates.games
 
         metrics = {}
-        for item in game_counts:
-            if game_counts[item] < min_games:
+        for item, (games, wins) in aggregates.items.items():
+            if games < min_games:
                 continue
 
-            wins = win_counts[item]
-            games = game_counts[item]
             wr = wins / games
 
             bayesian_wr = (wins + overall_win_rate * 10) / (games + 10)
@@ -910,11 +976,12 @@ class SmartItemWinRateStatistics(StatisticsFunction):
         return metrics, overall_win_rate
 
     @staticmethod
-    def display(data, metric='combined_score', **kwargs):
+    def display(aggregates, metric='combined_score', **kwargs):
+        load_plotting()
         k = kwargs.get("k", 30)
         min_games = kwargs.get("min_games", 20)
         
-        metrics, overall_win_rate = SmartItemWinRateStatistics.calculate_metrics(data, k, min_games)
+        metrics, overall_win_rate = SmartItemWinRateStatistics.calculate_metrics(aggregates, k, min_games)
 
         sorted_items = sorted(metrics.items(), key=lambda x: x[1][metric], reverse=True)[:k]
         
@@ -966,4 +1033,182 @@ class SmartItemWinRateStatistics(StatisticsFunction):
             })
             sel.annotation.set_fontsize(10)
 
-        plt.show()
+        show(kwargs.get("output"))
+
+
+class ItemPairSynergyStatistics(StatisticsFunction):
+    description = "Show item pairs that win more together than apart"
+    summary_method = "calculate_synergy"
+    summary_options = {"k": 30, "min_games": 20}
+
+    @staticmethod
+    def calculate_synergy(aggregates, k=30, min_games=20):
+        overall_win_rate = aggregates.wins / aggregates.games
+        item_win_rates = {item: wins / games for item, (games, wins) in aggregates.item_games.items()}
+
+        synergies = []
+        for pair, (games, wins) in aggregates.item_pairs.items():
+            if games < min_games:
+                continue
+            wr = wins / games
+            best_single = max(item_win_rates[pair[0]], item_win_rates[pair[1]])
+            synergies.append((pair, {
+                'games': games,
+                'win_rate': wr,
+                'best_single': best_single,
+                'synergy': wr - best_single,
+                'lift': wr / overall_win_rate,
+            }))
+        synergies.sort(key=lambda x: x[1]['synergy'], reverse=True)
+
+        return synergies[:k], overall_win_rate
+
+    @classmethod
+    def summary(cls, aggregates, **kwargs):
+        synergies, overall_win_rate = cls.calculate_summary(aggregates, **kwargs)
+        return {"overall_win_rate": overall_win_rate,
+                "pairs": {f"{first} + {second}": info for (first, second), info in synergies}}
+
+    @staticmethod
+    def display(aggregates, **kwargs):
+        load_plotting()
+        k = kwargs.get("k", 30)
+        min_games = kwargs.get("min_games", 20)
+        synergies, overall_win_rate = ItemPairSynergyStatistics.calculate_synergy(aggregates, k, min_games)
+
+        pairs = [pair for pair, _ in synergies]
+        labels = [f"{first} + {second}" for first, second in pairs]
+        win_rates = [info['win_rate'] * 100 for _, info in synergies]
+        best_single = [info['best_single'] * 100 for _, info in synergies]
+        x_values = range(len(pairs))
+
+        plt.style.use('seaborn-v0_8-darkgrid')
+        plt.figure(figsize=(14, 7))
+
+        cmap = cm.get_cmap('RdYlGn')
+        norm = plt.Normalize(vmin=0, vmax=100)
+
+        yerr = error_bars(aggregates.item_pairs, pairs, win_rates, kwargs)
+        bars = plt.bar(x_values, win_rates, yerr=yerr, capsize=2, color=cmap(norm(win_rates)), edgecolor='black')
+        plt.scatter(x_values, best_single, color='blue', alpha=0.5, label='Best single item win rate')
+        plt.axhline(overall_win_rate * 100, color='red', linestyle='--', label=f'Overall WR ({overall_win_rate*100:.2f}%)')
+
+        plt.xticks(x_values, labels, rotation=45, ha="right")
+        plt.ylabel("Win Rate")
+        plt.title(f"Top {k} Item Pairs by Synergy")
+        plt.ylim(0, 100)
+        plt.legend()
+        plt.tight_layout()
+
+        cursor = mplcursors.cursor(bars, hover=True)
+        cursor._epsilon = 3
+
+        @cursor.connect("add")
+        def on_hover(sel):
+            info = synergies[sel.index][1]
+            sel.annotation.set_text(f"{labels[sel.index]}\n"
+                                    f"Games: {info['games']}\n"
+                                    f"Pair WR: {info['win_rate']*100:.2f}%\n"
+                                    f"Best single WR: {info['best_single']*100:.2f}%\n"
+                                    f"Synergy: {info['synergy']*100:+.2f} pts\n"
+                                    f"Lift: {info['lift']:.2f}")
+            sel.annotation.get_bbox_patch().update({
+                "facecolor": "white",
+                "edgecolor": "black",
+                "boxstyle": "round,pad=0.5",
+                "alpha": 0.9,
+                "linewidth": 1.2
+            })
+            sel.annotation.set_fontsize(10)
+
+        show(kwargs.get("output"))
+
+
+class FrequentBuildStatistics(StatisticsFunction):
+    description = "Show frequent builds that win above each hero's baseline"
+    summary_method = "calculate_builds"
+    summary_options = {"min_support": 0.01, "min_lift": 1.05, "min_size": 3, "min_games": 20}
+
+    @staticmethod
+    def calculate_builds(aggregates, min_support=0.01, min_lift=1.05, min_size=3, min_games=20):
+        transactions, totals = {}, {}
+        for (hero, *items), (games, wins) in aggregates.item_builds().items():
+            transactions.setdefault(hero, []).append((items, games, wins))
+            total = totals.setdefault(hero, [0, 0])
+            total[0] += games
+            total[1] += wins
+
+        builds = {}
+        for hero, hero_transactions in transactions.items():
+            hero_games, hero_wins = totals[hero]
+            if hero_wins == 0:
+                continue
+            baseline = hero_wins / hero_games
+            min_count = max(min_games, int(np.ceil(min_support * hero_games)))
+
+            frequent = []
+            for items, games, wins in mine(hero_transactions, min_count):
+                lift = wins / games / baseline
+                if len(items) >= min_size and lift >= min_lift:
+                    frequent.append((tuple(sorted(items)), games, wins / games, lift))
+            if frequent:
+                builds[hero] = sorted(frequent, key=lambda x: x[3], reverse=True)
+
+        return builds
+
+    @classmethod
+    def summary(cls, aggregates, **kwargs):
+        builds = cls.calculate_summary(aggregates, **kwargs)
+        return {hero: [{"items": list(items), "games": games, "win_rate": win_rate, "lift": lift}
+                       for items, games, win_rate, lift in hero_builds]
+                for hero, hero_builds in builds.items()}
+
+    @staticmethod
+    def display(aggregates, **kwargs):
+        load_plotting()
+        k = kwargs.get("k", 30)
+        builds = FrequentBuildStatistics.calculate_builds(
+            aggregates, kwargs.get("min_support", 0.01), kwargs.get("min_lift", 1.05),
+            kwargs.get("min_size", 3), kwargs.get("min_games", 20))
+
+        top = sorted(((hero,) + build for hero, hero_builds in builds.items() for build in hero_builds),
+                     key=lambda x: x[4], reverse=True)[:k]
+        labels = [f"{hero}: {' + '.join(items)}" for hero, items, *_ in top]
+        lifts = [lift for *_, lift in top]
+        y_values = range(len(top))
+
+        plt.style.use('seaborn-v0_8-darkgrid')
+        plt.figure(figsize=(14, 8))
+
+        cmap = cm.get_cmap('RdYlGn')
+        norm = plt.Normalize(vmin=0.5, vmax=1.5)
+
+        bars = plt.barh(y_values, lifts, color=cmap(norm(lifts)), edgecolor='black')
+        plt.axvline(1, color='black', linestyle=':', alpha=0.5)
+
+        plt.yticks(y_values, labels)
+        plt.gca().invert_yaxis()
+        plt.xlabel("Lift over hero win rate")
+        plt.title(f"Top {k} Frequent Builds by Lift")
+        plt.tight_layout()
+
+        cursor = mplcursors.cursor(bars, hover=True)
+        cursor._epsilon = 3
+
+        @cursor.connect("add")
+        def on_hover(sel):
+            hero, items, games, win_rate, lift = top[sel.index]
+            sel.annotation.set_text(f"{hero}\n{', '.join(items)}\n"
+                                    f"Games: {games}\n"
+                                    f"Win Rate: {win_rate*100:.2f}%\n"
+                                    f"Lift: {lift:.2f}")
+            sel.annotation.get_bbox_patch().update({
+                "facecolor": "white",
+                "edgecolor": "black",
+                "boxstyle": "round,pad=0.5",
+                "alpha": 0.9,
+                "linewidth": 1.2
+            })
+            sel.annotation.set_fontsize(10)
+
+        show(kwargs.get("output"))
@@ -1,7 +1,6 @@
-import json
-import os
-
 import stats
+from aggregates import Aggregates, load_cache, save_cache, source_signature
+from storage import exists
 
 available_stats = [
     stats.RatingProgress,
@@ -17,6 +16,8 @@ available_stats = [
     stats.GameWinRateStatistics,
     stats.TrophyWinRateStatistics,
     stats.SmartItemWinRateStatistics,
+    stats.ItemPairSynergyStatistics,
+    stats.FrequentBuildStatistics,
 ]
 
 
@@ -27,17 +28,29 @@ def display_menu():
         print(f"{index}. {stat.description}")
 
 
+def choose_bandwidth():
+    modes = stats.AccurateWinRateByRating.BANDWIDTH_MODES
+    mode = input(f"Bandwidth ({', '.join(modes)}) [fixed]: ").strip() or "fixed"
+    if mode not in modes:
+        print("Invalid bandwidth, using fixed.")
+        mode = "fixed"
+    return modes[mode]
+
+
 def main():
     user = input("Enter username: ").strip()
     filename = f"data/{user}_stats.json"
 
-    if os.path.exists(filename):
-        with open(filename, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    else:
+    if not exists(filename):
         print("Invalid user.")
         return
 
+    aggregates = load_cache(filename)
+    if aggregates is None:
+        source = source_signature(filename)
+        aggregates = Aggregates.from_storage(filename)
+        save_cache(filename, aggregates, source)
+
     while True:
         display_menu()
         choice = input("Enter choice: ").strip()
@@ -51,7 +64,9 @@ def main():
         if choice == 0:
             break
         elif 1 <= choice <= len(available_stats):
-            available_stats[choice - 1].display(data)
+            stat = available_stats[choice - 1]
+            options = choose_bandwidth() if stat is stats.AccurateWinRateByRating else {}
+            stat.display(aggregates, **options)
         else:
             print("Invalid choice, please try again.")
 
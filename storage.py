@@ -0,0 +1,429 @@
+import glob
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: msvcrt only has exclusive locks, so readers wait for each other too.
+    import msvcrt
+    fcntl = None
+
+import json_stream
+from binary_storage import map_table, read_table, table_to_data, write_table
+from game_table import GameTable
+from sqlite_storage import connect, query_matches
+
+
+def journal_filename(filename):
+    return filename.replace("_stats.json", "_journal.jsonl")
+
+
+def compacting_filename(filename, snapshot_matches):
+    return filename.replace("_stats.json", f"_compacting_{snapshot_matches}.jsonl")
+
+
+def find_compacting(filename):
+    # A journal being folded into the snapshot, named after the number of
+    # matches in the snapshot it was based on. Returns (path, that number).
+    prefix = filename.replace("_stats.json", "_compacting_")
+    for path in glob.glob(glob.escape(prefix) + "*.jsonl"):
+        count = path[len(prefix):-len(".jsonl")]
+        if count.isdigit():
+            return path, int(count)
+    return None, None
+
+
+def pending_filename(filename, session):
+    return filename.replace("_stats.json", f"_pending_{session}.jsonl")
+
+
+def import_filename(filename):
+    return filename.replace("_stats.json", "_import.json")
+
+
+def binary_filename(filename):
+    return filename.replace("_stats.json", "_stats.bin")
+
+
+def database_filename(filename):
+    return filename.replace("_stats.json", "_stats.db")
+
+
+def lock_filename(filename, kind):
+    return filename.replace("_stats.json", f"_{kind}.lock")
+
+
+def lock_file(f, shared, blocking):
+    # Raises BlockingIOError if the lock is held elsewhere and not blocking.
+    if fcntl is not None:
+        fcntl.flock(f, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return
+        except OSError:
+            if not blocking:
+                raise BlockingIOError(f"{f.name} is locked") from None
+            time.sleep(0.05)
+
+
+def unlock_file(f):
+    # flock locks are released when the file is closed.
+    if fcntl is None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def user_lock(filename, kind, shared=False, wait_message=None):
+    # Advisory lock on a per-user lock file.
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    with open(lock_filename(filename, kind), "a") as f:
+        try:
+            lock_file(f, shared, blocking=False)
+        except BlockingIOError:
+            if wait_message:
+                print(wait_message)
+            lock_file(f, shared, blocking=True)
+        try:
+            yield
+        finally:
+            unlock_file(f)
+
+
+def writer_lock(filename):
+    # Held by every process that adds to or rewrites a user's history, so
+    # that there is one writer per user at a time.
+    return user_lock(filename, "writer", wait_message=f"Waiting for another process writing to {filename}...")
+
+
+def files_lock(filename, shared=False):
+    # Readers hold it shared while they read the stats files; writers hold it
+    # exclusively while they change more than one of them, or append a batch.
+    return user_lock(filename, "files", shared)
+
+
+def fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_path(path):
+    # Yields a temporary path to write instead of path. Once written, it is
+    # fsynced and renamed over path, so readers see either the old file or
+    # the complete new one, even if the writer is killed halfway.
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        yield temp_path
+        fsync_path(temp_path)
+        os.replace(temp_path, path)
+        fsync_path(os.path.dirname(path) or ".")
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def exists(filename):
+    return any(os.path.exists(path) for path in
+               (filename, binary_filename(filename), journal_filename(filename), database_filename(filename))) \
+        or find_compacting(filename)[0] is not None
+
+
+def uses_database(filename):
+    return os.path.exists(database_filename(filename))
+
+
+def uses_binary(filename):
+    binary = binary_filename(filename)
+    if not os.path.exists(binary):
+        return False
+    return not os.path.exists(filename) or os.path.getmtime(binary) >= os.path.getmtime(filename)
+
+
+def read_journal(path, limit=None):
+    # limit: the journal size before a bulk import that never finished.
+    match = None
+    position = 0
+    with open(path, "rb") as f:
+        for line in f:
+            position += len(line)
+            if not line.endswith(b"\n") or (limit is not None and position > limit):
+                # Partial record left behind by an interrupted write.
+                break
+            record = json.loads(line)
+            if "match" in record:
+                if match is not None:
+                    yield match
+                match = dict(record["match"])
+                match["games"] = []
+            else:
+                match["games"].append(record["game"])
+
+    if match is not None:
+        yield match
+
+
+def import_limit(filename):
+    try:
+        with open(import_filename(filename), "r", encoding="utf-8") as f:
+            batch = json.load(f)
+    except FileNotFoundError:
+        return None
+    if "pending" in batch and not os.path.exists(os.path.join(os.path.dirname(filename), batch["pending"])):
+        # Removing its pending file committed the batch.
+        return None
+    return batch["journal_size"]
+
+
+def recover_import(filename):
+    # Drops the records of an import that never finished; the caller holds
+    # the writer lock.
+    if not os.path.exists(import_filename(filename)):
+        return
+    limit = import_limit(filename)
+    if limit is not None and os.path.exists(journal_filename(filename)):
+        with open(journal_filename(filename), "rb+") as f:
+            f.truncate(limit)
+            os.fsync(f.fileno())
+    os.remove(import_filename(filename))
+    fsync_path(os.path.dirname(filename) or ".")
+
+
+def pending_journals(filename, snapshot_matches):
+    # A compacting journal still has to be replayed while the snapshot holds
+    # exactly the matches it was based on. Once the new snapshot is in place
+    # it holds more, and the leftover file is ignored until compaction
+    # removes it, so a crash between the two steps never replays it twice.
+    paths = []
+    compacting, base = find_compacting(filename)
+    if compacting is not None and base == snapshot_matches:
+        paths.append(compacting)
+    if os.path.exists(journal_filename(filename)):
+        paths.append(journal_filename(filename))
+    return paths
+
+
+def iter_journal(filename, snapshot_matches):
+    for path in pending_journals(filename, snapshot_matches):
+        yield from read_journal(path, import_limit(filename) if path == journal_filename(filename) else None)
+
+
+def iter_matches(filename):
+    count = 0
+    if os.path.exists(filename):
+        for match in json_stream.iter_matches(filename):
+            count += 1
+            yield match
+    yield from iter_journal(filename, count)
+
+
+def load_table(filename):
+    with files_lock(filename, shared=True):
+        if uses_database(filename):
+            connection = connect(database_filename(filename))
+            try:
+                return GameTable.from_data({"matches": list(query_matches(connection))})
+            finally:
+                connection.close()
+        if uses_binary(filename):
+            table = map_table(binary_filename(filename))
+            if not pending_journals(filename, table.match_count):
+                return table
+        return GameTable.from_data(read_data(filename))
+
+
+def load_data(filename):
+    with files_lock(filename, shared=True):
+        return read_data(filename)
+
+
+def read_snapshot(filename):
+    if uses_binary(filename):
+        return table_to_data(read_table(binary_filename(filename)))
+    if os.path.exists(filename):
+        with open(filename, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {
+        "matches": []
+    }
+
+
+def read_data(filename):
+    data = read_snapshot(filename)
+    data["matches"].extend(iter_journal(filename, len(data["matches"])))
+    return data
+
+
+def save_snapshot(filename, data):
+    with atomic_path(filename) as temp_filename:
+        with open(temp_filename, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+
+
+def save_binary(filename, data):
+    with atomic_path(binary_filename(filename)) as temp_filename:
+        write_table(temp_filename, GameTable.from_data(data))
+
+
+def save_snapshots(filename, data):
+    save_snapshot(filename, data)
+    if os.path.exists(binary_filename(filename)):
+        save_binary(filename, data)
+
+
+def compact(filename):
+    # The caller holds the writer lock, so the history cannot grow meanwhile.
+    # The journal is first renamed aside, which is the one step that moves
+    # its records out of the live journal; see pending_journals for how a
+    # crash at any later point is recovered.
+    with files_lock(filename):
+        recover_import(filename)
+        data = read_snapshot(filename)
+        compacting, base = find_compacting(filename)
+        if compacting is not None:
+            if base == len(data["matches"]):
+                # Finish a compaction that was interrupted before its snapshot was written.
+                data["matches"].extend(read_journal(compacting))
+                save_snapshots(filename, data)
+            os.remove(compacting)
+
+        if os.path.exists(journal_filename(filename)):
+            compacting = compacting_filename(filename, len(data["matches"]))
+            os.replace(journal_filename(filename), compacting)
+            fsync_path(os.path.dirname(filename) or ".")
+            data["matches"].extend(read_journal(compacting))
+            save_snapshots(filename, data)
+            os.remove(compacting)
+    return data
+
+
+def drop_partial_record(path):
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 4096)
+            f.seek(start)
+            chunk = f.read(position - start)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            f.truncate(position)
+
+
+def append_record(f, kind, record):
+    f.write(json.dumps({kind: record}, ensure_ascii=False) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class PendingMatch:
+    # The match an updater session is entering, appended game by game to a
+    # file of its own, so that nothing typed is lost, and moved into the
+    # history by save_pending once it is complete. The file stays locked
+    # while the session runs; create it under the writer lock, so that
+    # abandoned_pending never sees it before it is locked.
+    def __init__(self, filename):
+        self.path = pending_filename(filename, uuid.uuid4().hex)
+        self.file = open(self.path, "a", encoding="utf-8")
+        lock_file(self.file, shared=False, blocking=False)
+
+    def append_match(self, match):
+        append_record(self.file, "match", {key: value for key, value in match.items() if key != "games"})
+
+    def append_game(self, game):
+        append_record(self.file, "game", game)
+
+    def close(self):
+        unlock_file(self.file)
+        self.file.close()
+
+
+def abandoned_pending(filename):
+    # Pending files left by sessions that ended before saving their match,
+    # oldest first; the caller holds the writer lock.
+    paths = glob.glob(glob.escape(filename.replace("_stats.json", "_pending_")) + "*.jsonl")
+    abandoned = []
+    for path in sorted(paths, key=os.path.getmtime):
+        with open(path, "a", encoding="utf-8") as f:
+            try:
+                lock_file(f, shared=False, blocking=False)
+            except BlockingIOError:
+                continue
+            unlock_file(f)
+        abandoned.append(path)
+    return abandoned
+
+
+def save_pending(recorder, path):
+    # Moves the matches of a pending file into the history. The file is
+    # removed as part of the same write, so a crash at any point neither
+    # loses them nor saves them twice. Returns the matches saved.
+    matches = list(read_journal(path))
+    return matches[:recorder.import_matches(matches, pending=path)]
+
+
+class Journal:
+    def __init__(self, filename):
+        self.filename = filename
+        self.path = journal_filename(filename)
+        recover_import(filename)
+        if os.path.exists(self.path):
+            drop_partial_record(self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def append(self, kind, record):
+        append_record(self.file, kind, record)
+
+    def append_match(self, match):
+        self.append("match", {key: value for key, value in match.items() if key != "games"})
+
+    def append_game(self, game):
+        self.append("game", game)
+
+    def import_matches(self, matches, pending=None):
+        # One buffered write and a single fsync for the whole batch. The
+        # journal size before it is recorded first and only removed once the
+        # batch is on disk, so a batch cut short is ignored by readers and
+        # dropped by the next writer, never replayed in part. The batch of a
+        # pending file is committed by removing that file instead.
+        self.file.flush()
+        batch = {"journal_size": os.fstat(self.file.fileno()).st_size}
+        if pending is not None:
+            batch["pending"] = os.path.basename(pending)
+        with atomic_path(import_filename(self.filename)) as temp_filename:
+            with open(temp_filename, "w", encoding="utf-8") as f:
+                json.dump(batch, f)
+
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+        count = 0
+        for match in matches:
+            records = [encode({"match": {key: value for key, value in match.items() if key != "games"}})]
+            records.extend(encode({"game": game}) for game in match["games"])
+            self.file.write("\n".join(records) + "\n")
+            count += 1
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        if pending is not None:
+            os.remove(pending)
+            fsync_path(os.path.dirname(pending) or ".")
+        os.remove(import_filename(self.filename))
+        fsync_path(os.path.dirname(self.filename) or ".")
+        return count
+
+    def close(self):
+        self.file.close()
+
@@ -0,0 +1,191 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+
+from aggregates import Aggregates, append_cache, cache_filename, fresh_cache, load_cache, read_deltas, save_cache
+from constants import HEROES, ITEMS
+from sqlite_storage import Database, connect, query_matches
+from storage import (Journal, PendingMatch, compact, database_filename, files_lock, load_data, save_pending,
+                     save_snapshot, user_lock, uses_database)
+
+USER = "stress"
+
+
+def make_match(writer_id, sequence, games):
+    # Every game carries its writer and sequence, so a game that ends up in
+    # another writer's match is detected.
+    return {
+        "start_rating": writer_id,
+        "end_rating": sequence,
+        "hero": HEROES[writer_id % len(HEROES)],
+        "games": [{"result": "W" if (writer_id + sequence + index) % 2 else "L",
+                   "opponent_rating": writer_id * 100000 + sequence,
+                   "opponent_hero": HEROES[index % len(HEROES)],
+                   "items": {ITEMS[(sequence + index) % len(ITEMS)]: 1}} for index in range(games)],
+    }
+
+
+def write_matches(filename, writer_id, matches, games, compact_every):
+    # Records matches the way updater.py does: each game appended to a
+    # pending file outside the writer lock, then the finished match moved
+    # into the history and merged into the cache under it.
+    for sequence in range(matches):
+        match = make_match(writer_id, sequence, games)
+        # The writer lock without its waiting message, which every turn would print.
+        with user_lock(filename, "writer"):
+            pending = PendingMatch(filename)
+        try:
+            pending.append_match(match)
+            for game in match["games"]:
+                pending.append_game(game)
+        finally:
+            pending.close()
+        with user_lock(filename, "writer"):
+            base = fresh_cache(filename)
+            recorder = Database(database_filename(filename)) if uses_database(filename) else Journal(filename)
+            try:
+                saved = save_pending(recorder, pending.path)
+            finally:
+                recorder.close()
+            if base is not None:
+                append_cache(filename, base, Aggregates.from_data({"matches": saved}))
+            if compact_every and not uses_database(filename) and sequence % compact_every == compact_every - 1:
+                # As compact.py does, folding the cache's deltas into a new base.
+                aggregates = load_cache(filename)
+                compact(filename)
+                if aggregates is not None:
+                    save_cache(filename, aggregates)
+
+
+def check_matches(matches, games):
+    # Each match is written whole, so every match read back has all its games.
+    seen = set()
+    for match in matches:
+        key = (match["start_rating"], match["end_rating"])
+        if key in seen:
+            return f"match {key} appears twice"
+        seen.add(key)
+        expected = make_match(*key, games)
+        if {name: match[name] for name in ("start_rating", "end_rating", "hero")} != \
+                {name: expected[name] for name in ("start_rating", "end_rating", "hero")}:
+            return f"match {key} has the wrong hero"
+        if match["games"] != expected["games"][:len(match["games"])]:
+            return f"match {key} holds games of another match"
+        if len(match["games"]) != games:
+            return f"match {key} has {len(match['games'])} of {games} games"
+    return None
+
+
+def stored_matches(filename):
+    if uses_database(filename):
+        with files_lock(filename, shared=True):
+            connection = connect(database_filename(filename))
+            try:
+                return list(query_matches(connection))
+            finally:
+                connection.close()
+    return load_data(filename)["matches"]
+
+
+def read_until(filename, games, stop, failures):
+    reads = 0
+    while not stop.is_set():
+        try:
+            problem = check_matches(stored_matches(filename), games)
+            with open(cache_filename(filename), "r", encoding="utf-8") as f:
+                for line in f:
+                    json.loads(line)
+            list(read_deltas(filename))
+        except (OSError, ValueError, KeyError) as e:
+            problem = f"{type(e).__name__}: {e}"
+        if problem:
+            failures.put(problem)
+        reads += 1
+    return reads
+
+
+def crash_during_snapshot(filename):
+    # Kill a process halfway through rewriting the snapshot: the old snapshot
+    # must survive intact.
+    before = load_data(filename)
+    big = {"matches": before["matches"] * 200}
+    process = multiprocessing.Process(target=save_snapshot, args=(filename, big))
+    process.start()
+    time.sleep(0.05)
+    os.kill(process.pid, signal.SIGKILL)
+    process.join()
+    with open(filename, "r", encoding="utf-8") as f:
+        after = json.load(f)
+    for name in os.listdir(os.path.dirname(filename)):
+        if name.endswith(f".{process.pid}.tmp"):
+            os.remove(os.path.join(os.path.dirname(filename), name))
+    return after == before or after == big
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many concurrent writers and readers against one user's stats.")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--matches", type=int, default=25, help="matches per writer (default: 25)")
+    parser.add_argument("--games", type=int, default=4, help="games per match (default: 4)")
+    parser.add_argument("--compact-every", type=int, default=5, help="compact after this many matches (0: never)")
+    parser.add_argument("--sqlite", action="store_true", help="write to a SQLite database instead of the journal")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary data directory")
+    args = parser.parse_args()
+
+    dirname = tempfile.mkdtemp(prefix="stress_writers_")
+    filename = f"{dirname}/{USER}_stats.json"
+    save_snapshot(filename, {"matches": []})
+    if args.sqlite:
+        Database(database_filename(filename)).close()
+    save_cache(filename, Aggregates.from_storage(filename))
+
+    start = time.perf_counter()
+    manager = multiprocessing.Manager()
+    stop, failures = manager.Event(), manager.Queue()
+    with multiprocessing.Pool(args.writers + args.readers) as pool:
+        readers = [pool.apply_async(read_until, (filename, args.games, stop, failures)) for _ in range(args.readers)]
+        writers = [pool.apply_async(write_matches, (filename, writer_id, args.matches, args.games, args.compact_every))
+                   for writer_id in range(args.writers)]
+        for writer in writers:
+            writer.get()
+        stop.set()
+        reads = sum(reader.get() for reader in readers)
+
+    problems = []
+    while not failures.empty():
+        problems.append(f"reader: {failures.get()}")
+    matches = stored_matches(filename)
+    expected = args.writers * args.matches
+    problem = check_matches(matches, args.games)
+    if problem:
+        problems.append(problem)
+    if len(matches) != expected or any(len(match["games"]) != args.games for match in matches):
+        problems.append(f"{len(matches)} matches stored, expected {expected} complete ones")
+    cached = load_cache(filename)
+    if cached is None or cached.to_dict() != Aggregates.from_storage(filename).to_dict():
+        problems.append("the cache does not match the stored history")
+    if not args.sqlite and not crash_during_snapshot(filename):
+        problems.append("the snapshot was corrupted by a writer killed mid-write")
+
+    print(f"{args.writers} writers x {args.matches} matches, {args.readers} readers ({reads} reads) "
+          f"in {time.perf_counter() - start:.2f}s")
+    if args.keep:
+        print(f"Data kept in {dirname}")
+    else:
+        shutil.rmtree(dirname)
+    for problem in problems:
+        print(f"FAILED: {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from constants import HEROES, ITEMS  # noqa: E402
+
+
+def make_matches(count, games=3, offset=0):
+    matches = []
+    for m in range(offset, offset + count):
+        matches.append({
+            "start_rating": 1000 + m,
+            "end_rating": 1010 + m,
+            "hero": HEROES[m % len(HEROES)],
+            "games": [{
+                "result": "W" if (m + g) % 3 else "L",
+                "opponent_rating": None if (m + g) % 5 == 4 else 900 + 7 * m + g,
+                "opponent_hero": HEROES[(m + g + 1) % len(HEROES)],
+                "items": {ITEMS[(m + g) % len(ITEMS)]: 1 + g % 2, ITEMS[(3 * m + 5) % len(ITEMS)]: 1},
+            } for g in range(games - m % 2)],
+        })
+    for match in matches:
+        for game in match["games"]:
+            game["items"] = dict(sorted(game["items"].items()))
+    return matches
+
+
+@pytest.fixture
+def filename(tmp_path):
+    return str(tmp_path / "user_stats.json")
@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+
+import aggregates
+from aggregates import Aggregates, Tally, build_tally
+from conftest import make_matches
+from constants import ITEMS
+from game_table import GameTable
+from sqlite_storage import Database
+from storage import Journal, database_filename, save_binary, save_snapshot
+
+MATCHES = make_matches(12)
+
+
+def counts(aggregates):
+    return {name: value for name, value in aggregates.to_dict().items() if name != "sources"}
+
+
+def normalized(aggregates):
+    # Backends may see keys in a different order; the counts must agree.
+    return {name: sorted(map(repr, value)) if isinstance(value, list) and name != "rating_series" else value
+            for name, value in counts(aggregates).items()}
+
+
+def store_json(filename):
+    save_snapshot(filename, {"matches": MATCHES})
+
+
+def store_journal(filename):
+    save_snapshot(filename, {"matches": MATCHES[:5]})
+    recorder = Journal(filename)
+    try:
+        recorder.import_matches(iter(MATCHES[5:]))
+    finally:
+        recorder.close()
+
+
+def store_binary(filename):
+    save_snapshot(filename, {"matches": []})
+    save_binary(filename, {"matches": MATCHES[:7]})
+    recorder = Journal(filename)
+    try:
+        recorder.import_matches(iter(MATCHES[7:]))
+    finally:
+        recorder.close()
+
+
+def store_sqlite(filename):
+    database = Database(database_filename(filename))
+    try:
+        database.import_matches(iter(MATCHES))
+    finally:
+        database.close()
+
+
+@pytest.mark.parametrize("store", [store_json, store_journal, store_binary, store_sqlite])
+def test_backends_agree(filename, store):
+    store(filename)
+    expected = Aggregates.from_data({"matches": MATCHES})
+    assert normalized(Aggregates.from_storage(filename)) == normalized(expected)
+
+
+def test_one_pass_counts_every_game():
+    aggregates = Aggregates.from_data({"matches": MATCHES})
+    games = [game for match in MATCHES for game in match["games"]]
+    wins = sum(game["result"] == "W" for game in games)
+    assert (aggregates.matches, aggregates.games, aggregates.wins) == (len(MATCHES), len(games), wins)
+    for tally in (aggregates.opponents, aggregates.game_numbers, aggregates.trophies):
+        assert [sum(column) for column in zip(*tally.values())] == [len(games), wins]
+    assert sum(games for games, _ in aggregates.item_games.values()) == sum(len(game["items"]) for game in games)
+    assert sum(games for games, _ in aggregates.items.values()) == sum(
+        sum(game["items"].values()) for game in games)
+    assert aggregates.item_copies.keys() == {(item, count) for game in games for item, count in game["items"].items()}
+
+
+def test_item_pairs_match_a_double_loop():
+    expected = Tally()
+    for match in MATCHES:
+        for game in match["games"]:
+            items = sorted(game["items"])
+            for i, first in enumerate(items):
+                for second in items[i + 1:]:
+                    expected.add((first, second), 1, int(game["result"] == "W"))
+    pairs = Aggregates.from_data({"matches": MATCHES}).item_pairs
+    assert dict(pairs) == dict(expected)
+
+
+def test_chunks_with_their_own_vocabularies(monkeypatch):
+    # Items outside constants.py get ids in order of appearance, so each
+    # chunk numbers them differently.
+    matches = make_matches(6)
+    for index, name in enumerate(["zz_unknown", "aa_unknown", "zz_unknown"]):
+        matches[2 * index + 1]["games"][0]["items"] = {name: 1, ITEMS[index]: 2}
+    monkeypatch.setattr(aggregates, "CHUNK_MATCHES", 2)
+    assert Aggregates.from_matches(matches).to_dict() == Aggregates.from_data({"matches": matches}).to_dict()
+
+
+def test_sqlite_keeps_first_seen_order(filename):
+    # Pairs sharing their earlier entry are ordered by the later one in that
+    # game, even when a later game holds them closer together.
+    a, b, c, d = ITEMS[:4]
+    items = [{a: 1, d: 1, c: 1, b: 1}, {b: 1, a: 1}, {c: 2, a: 1}]
+    matches = make_matches(1, games=3)
+    for game, game_items in zip(matches[0]["games"], items):
+        game["items"] = game_items
+    save_snapshot(filename, {"matches": matches})
+    database = Database(database_filename(filename))
+    try:
+        database.import_matches(iter(matches))
+    finally:
+        database.close()
+    assert counts(Aggregates.from_storage(filename)) == counts(Aggregates.from_data({"matches": matches}))
+
+
+@pytest.mark.parametrize("store", [store_json, store_journal, store_binary, store_sqlite])
+def test_builds_are_mined_from_the_sources(filename, store):
+    store(filename)
+    expected = build_tally(GameTable.from_data({"matches": MATCHES}), np.array(
+        [game["result"] == "W" for match in MATCHES for game in match["games"]], dtype=np.int64))
+    aggregates = Aggregates.from_storage(filename)
+    assert aggregates.item_builds() == expected
+    assert "builds" not in aggregates.to_dict()
+    assert Aggregates.from_dict(aggregates.to_dict()).item_builds() == expected
+
+
+def test_build_tally():
+    matches = make_matches(1, games=4)
+    a, b, c = sorted(ITEMS[:3])
+    for game, items in zip(matches[0]["games"], [{c: 2, a: 1}, {}, {a: 1, c: 1}, {b: 1}]):
+        game["items"] = items
+    table = GameTable.from_data({"matches": matches})
+    hero = matches[0]["hero"]
+    assert list(build_tally(table, table.result.astype(np.int64)).items()) == [
+        ((hero, a, c), [2, sum(game["result"] == "W" for game in matches[0]["games"][::2])]),
+        ((hero,), [1, int(matches[0]["games"][1]["result"] == "W")]),
+        ((hero, b), [1, int(matches[0]["games"][3]["result"] == "W")]),
+    ]
@@ -0,0 +1,67 @@
+from collections import Counter
+
+import autocomplete
+from aggregates import Aggregates
+from autocomplete import Completer, get_completer, set_usage
+from conftest import make_matches
+from constants import HEROES, ITEMS
+from updater import add_game
+
+
+def completions(completer, text):
+    matches, state = [], 0
+    while (match := completer.complete(text, state)) is not None:
+        matches.append(match)
+        state += 1
+    return matches
+
+
+def test_prefix_matches_agree_with_a_scan():
+    completer = Completer(ITEMS + [""] + ITEMS[:5])
+    for text in ["", "a", "s", "sh", "zz", ITEMS[0], ITEMS[0][:-1]]:
+        expected = sorted(set(option for option in ITEMS if option.startswith(text)))
+        assert completer.prefix_matches(text) == expected
+        assert completions(completer, text) == expected
+
+
+def test_completers_are_built_once_per_options_list(monkeypatch):
+    monkeypatch.setattr(autocomplete, "completers", {})
+    completer = get_completer(ITEMS)
+    assert get_completer(ITEMS) is completer
+    assert get_completer(HEROES) is not completer
+    # An equal but distinct list gets a completer of its own.
+    assert get_completer(list(ITEMS)) is not completer
+    assert get_completer(ITEMS) is completer
+
+
+def test_usage_ranks_completions(monkeypatch):
+    monkeypatch.setattr(autocomplete, "completers", {})
+    options = ["shield", "shell", "shiv", "sword"]
+    set_usage(options, {"shiv": 3, "shell": 1, "sword": 9})
+    assert completions(get_completer(options), "sh") == ["shiv", "shell", "shield"]
+    # Ties, including unused options, keep alphabetical order.
+    set_usage(options, {})
+    assert completions(get_completer(options), "sh") == ["shell", "shield", "shiv"]
+
+
+def test_usage_is_learned_per_hero():
+    matches = make_matches(12)
+    aggregates = Aggregates.from_data({"matches": matches})
+    hero = matches[0]["hero"]
+    expected = Counter(item for match in matches if match["hero"] == hero
+                       for game in match["games"] for item in game["items"])
+    assert aggregates.item_usage(hero) == dict(expected)
+    assert sum(aggregates.item_usage().values()) == sum(
+        len(game["items"]) for match in matches for game in match["games"])
+
+
+def test_entered_games_update_usage(monkeypatch):
+    monkeypatch.setattr(autocomplete, "completers", {})
+    monkeypatch.setattr(autocomplete, "active", None)
+    answers = iter(["W", "1200", HEROES[1], ITEMS[2], ITEMS[2], ITEMS[5], ""])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    usage = {ITEMS[5]: 4}
+    game = add_game(usage)
+    assert game["items"] == dict(sorted({ITEMS[2]: 2, ITEMS[5]: 1}.items()))
+    # Usage counts games, not copies.
+    assert usage == {ITEMS[2]: 1, ITEMS[5]: 5}
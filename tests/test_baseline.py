@@ -0,0 +1,125 @@
+import pytest
+
+import stats
+from aggregates import Aggregates
+from conftest import make_matches
+from constants import RELICS, UNIQUES
+from game_table import GameTable
+
+# The statistics computed the way the original per-statistic loops over the
+# match dicts did, in the same order, including how ties were broken.
+
+
+def tallies(matches, keys):
+    counts = {}
+    for match in matches:
+        trophies = 0
+        for index, game in enumerate(match["games"]):
+            won = game["result"] == "W"
+            for key, weight in keys(match, index, trophies, game):
+                games, wins = counts.get(key, (0, 0))
+                counts[key] = (games + weight, wins + weight * won)
+            trophies += won
+    return counts
+
+
+def by_win_rate(counts, min_games, k=None):
+    win_rates = [(key, wins / games) for key, (games, wins) in counts.items() if games >= min_games]
+    return tuple(zip(*sorted(win_rates, key=lambda x: x[1], reverse=True)[:k]))
+
+
+def by_key(counts):
+    return tuple(zip(*sorted(((key, wins / games) for key, (games, wins) in counts.items()), key=lambda x: x[0])))
+
+
+def usage(counts, k):
+    top = sorted(counts, key=lambda key: counts[key][0], reverse=True)[:k]
+    return top, [counts[key][1] for key in top], [counts[key][0] - counts[key][1] for key in top]
+
+
+def opponents(match, index, trophies, game):
+    return [(game["opponent_hero"], 1)]
+
+
+def items(match, index, trophies, game):
+    return list(game["items"].items())
+
+
+def item_games(match, index, trophies, game):
+    return [(item, 1) for item in game["items"]]
+
+
+def relics(match, index, trophies, game):
+    return [(item, 1) for item in game["items"] if item in RELICS]
+
+
+def uniques(match, index, trophies, game):
+    return [(item, 1) for item in game["items"] if item in UNIQUES[match["hero"]]]
+
+
+def baseline_matches():
+    matches = make_matches(80, games=6)
+    for number, match in enumerate(matches):
+        for game in match["games"][number % 3::2]:
+            extra = UNIQUES[match["hero"]][:1] + RELICS[number % 4:number % 4 + 1]
+            game["items"] = dict(sorted({**game["items"], **dict.fromkeys(extra, 1)}.items()))
+    return matches
+
+
+MATCHES = baseline_matches()
+
+
+@pytest.fixture(params=["matches", "table"])
+def aggregates(request):
+    if request.param == "table":
+        return Aggregates.from_table(GameTable.from_data({"matches": MATCHES}))
+    return Aggregates.from_matches(iter(MATCHES))
+
+
+def test_rating_progress(aggregates):
+    x_values, y_values = [0, 1], [MATCHES[0]["start_rating"], MATCHES[0]["end_rating"]]
+    for previous, match in zip(MATCHES, MATCHES[1:]):
+        if previous["end_rating"] != match["start_rating"]:
+            x_values += [x_values[-1] + 0.5, x_values[-1] + 1]
+            y_values += [None, match["start_rating"]]
+        x_values.append(int(x_values[-1]) + 1)
+        y_values.append(match["end_rating"])
+    assert [list(values) for values in stats.RatingProgress.calculate_ratings(aggregates)] == [x_values, y_values]
+
+
+def test_hero_statistics(aggregates):
+    counts = tallies(MATCHES, opponents)
+    games = sorted(((hero, games) for hero, (games, _) in counts.items() if games >= 3), key=lambda x: x[1],
+                   reverse=True)
+    assert tuple(map(tuple, stats.OpponentHeroDistribution.calculate_games(aggregates, 3))) == tuple(zip(*games))
+    assert tuple(map(tuple, stats.WinRateVsHeroStatistics.calculate_win_rates(aggregates, 3))) == \
+        by_win_rate(counts, 3)
+
+
+@pytest.mark.parametrize("stat, keys", [(stats.ItemUsageStatistics, items),
+                                        (stats.ItemBinaryUsageStatistics, item_games)])
+def test_item_usage(aggregates, stat, keys):
+    expected = usage(tallies(MATCHES, keys), 12)
+    assert [list(values) for values in stat.calculate_usage(aggregates, 12)] == [list(values) for values in expected]
+
+
+@pytest.mark.parametrize("stat, keys", [(stats.ItemWinRateStatistics, items),
+                                        (stats.ItemBinaryWinRateStatistics, item_games)])
+def test_item_win_rates(aggregates, stat, keys):
+    assert tuple(map(tuple, stat.calculate_win_rates(aggregates, 10, 4))) == \
+        by_win_rate(tallies(MATCHES, keys), 4, 10)
+
+
+@pytest.mark.parametrize("stat, keys", [(stats.RelicWinRateStatistics, relics),
+                                        (stats.UniqueWinRateStatistics, uniques)])
+def test_relic_and_unique_win_rates(aggregates, stat, keys):
+    expected = by_win_rate(tallies(MATCHES, keys), 2)
+    assert expected
+    assert tuple(map(tuple, stat.calculate_win_rates(aggregates, 2))) == expected
+
+
+def test_game_and_trophy_win_rates(aggregates):
+    games = tallies(MATCHES, lambda match, index, trophies, game: [(index + 1, 1)])
+    trophies = tallies(MATCHES, lambda match, index, trophies, game: [(trophies, 1)])
+    assert tuple(map(tuple, stats.GameWinRateStatistics.calculate_win_rates(aggregates))) == by_key(games)
+    assert tuple(map(tuple, stats.TrophyWinRateStatistics.calculate_win_rates(aggregates))) == by_key(trophies)
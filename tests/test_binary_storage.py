@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from binary_storage import map_table, read_table, table_to_data, write_table
+from conftest import make_matches
+from game_table import GameTable
+from storage import binary_filename, load_data, load_table, save_binary, save_snapshot
+
+
+def test_binary_round_trip(tmp_path):
+    data = {"matches": make_matches(6)}
+    path = str(tmp_path / "stats.bin")
+    write_table(path, GameTable.from_data(data))
+    assert table_to_data(read_table(path)) == data
+    assert table_to_data(map_table(path)) == data
+
+
+def test_binary_snapshot_is_preferred(filename):
+    data = {"matches": make_matches(6)}
+    save_snapshot(filename, {"matches": []})
+    save_binary(filename, data)
+    assert os.path.exists(binary_filename(filename))
+    assert load_data(filename) == data
+    assert table_to_data(load_table(filename)) == data
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "stats.bin"
+    write_table(str(path), GameTable.from_data({"matches": make_matches(2)}))
+    data = path.read_bytes()
+    path.write_bytes(b"JSON" + data[4:])
+    with pytest.raises(ValueError, match="Not a stats binary file"):
+        read_table(str(path))
+    path.write_bytes(data[:4] + bytes([99]) + data[5:])
+    with pytest.raises(ValueError, match="version 99"):
+        read_table(str(path))
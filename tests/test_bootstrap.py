@@ -0,0 +1,39 @@
+import numpy as np
+
+from aggregates import Aggregates, Tally
+from bootstrap import confidence_intervals, tally_intervals
+from conftest import make_matches
+
+
+def test_serial_and_pooled_agree():
+    games, wins = [40, 7, 300, 1], [22, 1, 150, 1]
+    serial = confidence_intervals(games, wins, replicates=1100, seed=3)
+    pooled = confidence_intervals(games, wins, replicates=1100, seed=3, processes=2)
+    assert np.array_equal(serial, pooled)
+    assert not np.array_equal(serial, confidence_intervals(games, wins, replicates=1100, seed=4))
+
+
+def test_single_copies_match_plain_tally():
+    tally = Tally({"a": [30, 12], "b": [50, 40]})
+    copies = Tally({("a", 1): [30, 12], ("b", 1): [50, 40]})
+    assert np.array_equal(tally_intervals(tally, ["b", "a"]), tally_intervals(tally, ["b", "a"], copies))
+
+
+def test_copies_are_resampled_with_their_game():
+    # 100 games holding two copies each: as wide as 100 games, not 200.
+    tally = Tally({"pair": [200, 100], "single": [100, 50], "independent": [200, 100]})
+    copies = Tally({("pair", 2): [100, 50], ("single", 1): [100, 50], ("independent", 1): [200, 100]})
+    lower, upper = tally_intervals(tally, ["pair", "single", "independent"], copies, replicates=4000)
+    width = upper - lower
+    assert abs(width[0] - width[1]) < 0.02
+    assert width[0] > 1.3 * width[2]
+
+
+def test_item_copies_add_up_to_items():
+    aggregates = Aggregates.from_data({"matches": make_matches(20)})
+    totals = Tally()
+    for (item, count), (games, wins) in aggregates.item_copies.items():
+        totals.add(item, count * games, count * wins)
+    assert totals == aggregates.items
+    assert tally_intervals(aggregates.items, list(aggregates.items), aggregates.item_copies)[0].shape == \
+        (len(aggregates.items),)
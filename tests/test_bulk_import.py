@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from bulk_import import item_counts, read_matches
+from constants import HEROES, ITEMS
+
+HERO, OTHER = HEROES[:2]
+A, B = sorted(ITEMS[:2])
+
+
+def imported(tmp_path, name, text, file_format=None):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    errors = []
+    return list(read_matches([str(path)], file_format, errors.append)), errors
+
+
+def test_csv_rows_group_into_matches(tmp_path):
+    text = ("match,start_rating,end_rating,hero,result,opponent_rating,opponent_hero,items\n"
+            f"1,1000,1020,{HERO},W,990,{OTHER},{A};{B};{A}\n"
+            f"1,1000,1020,{HERO},l,1010,{OTHER},\n"
+            f",1020,1010,{HERO.upper()},L,1100,{OTHER},{B}\n")
+    matches, errors = imported(tmp_path, "games.csv", text)
+    assert errors == []
+    assert matches == [
+        {"start_rating": 1000, "end_rating": 1020, "hero": HERO, "games": [
+            {"result": "W", "opponent_rating": 990, "opponent_hero": OTHER, "items": {A: 2, B: 1}},
+            {"result": "L", "opponent_rating": 1010, "opponent_hero": OTHER, "items": {}},
+        ]},
+        {"start_rating": 1020, "end_rating": 1010, "hero": HERO, "games": [
+            {"result": "L", "opponent_rating": 1100, "opponent_hero": OTHER, "items": {B: 1}},
+        ]},
+    ]
+
+
+def test_errors_name_the_line_and_drop_the_whole_match(tmp_path):
+    row = {"match": 1, "start_rating": 1000, "end_rating": 1020, "hero": HERO, "result": "W",
+           "opponent_rating": 990, "opponent_hero": OTHER, "items": [A]}
+    lines = [
+        json.dumps(row),
+        json.dumps(dict(row, result="X", opponent_rating="high")),
+        "",
+        json.dumps(dict(row, match=2)),
+        "{not json",
+        json.dumps(dict(row, match=3, items={B: 2})),
+        json.dumps(dict(row, match=3, start_rating=999)),
+        json.dumps(dict(row, match=4, items=["not an item"])),
+        json.dumps(dict(row, match=5)),
+    ]
+    matches, errors = imported(tmp_path, "games.jsonl", "\n".join(lines) + "\n")
+    path = str(tmp_path / "games.jsonl")
+    assert [error.split(": ", 1)[0] for error in errors] == [f"{path}:{line}" for line in (2, 5, 7, 8)]
+    assert "result must be W or L, got 'X'" in errors[0] and "opponent_rating must be an integer" in errors[0]
+    assert "invalid JSON" in errors[1]
+    assert "changes start_rating, end_rating, hero mid-match" in errors[2]
+    assert "unknown items 'not an item'" in errors[3]
+    # The unreadable line may have belonged to match 2, so only match 5 is kept.
+    assert matches == [{"start_rating": 1000, "end_rating": 1020, "hero": HERO, "games": [
+        {"result": "W", "opponent_rating": 990, "opponent_hero": OTHER, "items": {A: 1}}]}]
+
+
+def test_missing_columns(tmp_path):
+    matches, errors = imported(tmp_path, "games.csv", "match,hero\n1,x\n")
+    assert matches == []
+    assert errors == [f"{tmp_path / 'games.csv'}: missing columns: start_rating, end_rating, result, "
+                      "opponent_rating, opponent_hero, items"]
+
+
+@pytest.mark.parametrize("value, expected", [
+    (f"{B};{A};{B}", {A: 1, B: 2}),
+    (f" {A.upper()} ; ;{B}", {A: 1, B: 1}),
+    ([B, A, A], {A: 2, B: 1}),
+    ({B: 2, A.upper(): 1}, {A: 1, B: 2}),
+    ("", {}),
+    (None, {}),
+])
+def test_item_counts(value, expected):
+    items = item_counts(value, "items")
+    assert items == expected
+    assert list(items) == sorted(items)
+
+
+@pytest.mark.parametrize("value", [{A: 0}, {A: "2"}, [A, 3], 5, "not an item"])
+def test_invalid_item_counts(value):
+    with pytest.raises(ValueError):
+        item_counts(value, "items")
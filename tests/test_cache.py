@@ -0,0 +1,89 @@
+import os
+
+from aggregates import (Aggregates, append_cache, cache_filename, delta_filename, fresh_cache, load_cache,
+                        save_cache)
+from conftest import make_matches
+from storage import Journal, save_snapshot
+
+MATCHES = make_matches(12)
+
+
+def test_cache_round_trip(filename):
+    save_snapshot(filename, {"matches": MATCHES})
+    aggregates = Aggregates.from_storage(filename)
+    save_cache(filename, aggregates)
+    assert load_cache(filename).to_dict() == aggregates.to_dict()
+
+
+def test_stale_cache_is_ignored(filename):
+    save_snapshot(filename, {"matches": MATCHES[:5]})
+    save_cache(filename, Aggregates.from_storage(filename))
+    append_matches(filename, MATCHES[5:])
+    os.remove(delta_filename(filename))
+    assert load_cache(filename) is None
+    with open(cache_filename(filename), "w", encoding="utf-8") as f:
+        f.write("{")
+    assert load_cache(filename) is None
+
+
+def append_matches(filename, matches):
+    base = fresh_cache(filename)
+    recorder = Journal(filename)
+    try:
+        recorder.import_matches(matches)
+    finally:
+        recorder.close()
+    if base is not None:
+        append_cache(filename, base, Aggregates.from_data({"matches": matches}))
+
+
+def test_cache_deltas(filename):
+    save_snapshot(filename, {"matches": MATCHES[:5]})
+    save_cache(filename, Aggregates.from_storage(filename))
+    append_matches(filename, MATCHES[5:8])
+    append_matches(filename, MATCHES[8:])
+    assert fresh_cache(filename) is not None
+    assert load_cache(filename).to_dict() == Aggregates.from_storage(filename).to_dict()
+
+    # Saving a new base folds the deltas into it.
+    save_cache(filename, load_cache(filename))
+    assert not os.path.exists(delta_filename(filename))
+    assert load_cache(filename).to_dict() == Aggregates.from_storage(filename).to_dict()
+
+
+def test_deltas_of_a_replaced_base_are_ignored(filename):
+    save_snapshot(filename, {"matches": MATCHES[:5]})
+    save_cache(filename, Aggregates.from_storage(filename))
+    base = fresh_cache(filename)
+    # Another process saves a new base, built before the matches below were written.
+    save_cache(filename, Aggregates.from_storage(filename))
+    recorder = Journal(filename)
+    try:
+        recorder.import_matches(MATCHES[5:])
+    finally:
+        recorder.close()
+    append_cache(filename, base, Aggregates.from_data({"matches": MATCHES[5:]}))
+    assert fresh_cache(filename) is None
+    assert load_cache(filename) is None
+
+
+def test_partial_delta_leaves_the_cache_stale(filename):
+    save_snapshot(filename, {"matches": MATCHES[:5]})
+    save_cache(filename, Aggregates.from_storage(filename))
+    append_matches(filename, MATCHES[5:8])
+    with open(delta_filename(filename), "a", encoding="utf-8") as f:
+        f.write('{"base": "')
+    assert load_cache(filename).to_dict() == Aggregates.from_storage(filename).to_dict()
+
+    append_matches(filename, MATCHES[8:])
+    assert load_cache(filename).to_dict() == Aggregates.from_storage(filename).to_dict()
+
+    recorder = Journal(filename)
+    try:
+        recorder.import_matches(make_matches(1, offset=20))
+    finally:
+        recorder.close()
+    with open(delta_filename(filename), "a", encoding="utf-8") as f:
+        f.write('{"base": "')
+    assert fresh_cache(filename) is None
+    assert load_cache(filename) is None
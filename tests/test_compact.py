@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+import storage
+from conftest import make_matches
+from storage import Journal, compact, journal_filename, load_data, save_binary, save_snapshot
+
+
+class Crash(Exception):
+    pass
+
+
+def record(filename, matches):
+    journal = Journal(filename)
+    try:
+        for match in matches:
+            journal.append_match(match)
+            for game in match["games"]:
+                journal.append_game(game)
+    finally:
+        journal.close()
+
+
+def crash(*args, **kwargs):
+    raise Crash
+
+
+@pytest.fixture(params=["json", "binary"])
+def history(request, filename):
+    snapshot, journal = make_matches(4), make_matches(3, offset=4)
+    save_snapshot(filename, {"matches": snapshot})
+    if request.param == "binary":
+        save_binary(filename, {"matches": snapshot})
+    record(filename, journal)
+    return snapshot + journal
+
+
+def test_compact_folds_the_journal(filename, history):
+    assert compact(filename)["matches"] == history
+    assert not os.path.exists(journal_filename(filename))
+    assert storage.find_compacting(filename)[0] is None
+    assert load_data(filename)["matches"] == history
+
+
+def test_kill_after_snapshot_before_journal_removal(filename, history, monkeypatch):
+    # The new snapshot is in place but the compacting journal is still there.
+    monkeypatch.setattr(storage.os, "remove", crash)
+    with pytest.raises(Crash):
+        compact(filename)
+    monkeypatch.undo()
+
+    assert storage.find_compacting(filename)[0] is not None
+    assert load_data(filename)["matches"] == history
+    assert compact(filename)["matches"] == history
+    assert storage.find_compacting(filename)[0] is None
+    assert load_data(filename)["matches"] == history
+
+
+def test_kill_before_snapshot_is_written(filename, history, monkeypatch):
+    monkeypatch.setattr(storage, "save_snapshots", crash)
+    with pytest.raises(Crash):
+        compact(filename)
+    monkeypatch.undo()
+
+    assert not os.path.exists(journal_filename(filename))
+    assert load_data(filename)["matches"] == history
+
+    # New games recorded before the next compaction come after the interrupted ones.
+    extra = make_matches(2, offset=7)
+    record(filename, extra)
+    assert load_data(filename)["matches"] == history + extra
+    assert compact(filename)["matches"] == history + extra
+    assert load_data(filename)["matches"] == history + extra
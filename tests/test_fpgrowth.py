@@ -0,0 +1,36 @@
+from itertools import combinations
+
+import numpy as np
+
+from fpgrowth import mine
+
+
+def brute_force(transactions, min_count):
+    supports = {}
+    for items, games, wins in transactions:
+        for size in range(1, len(items) + 1):
+            for itemset in combinations(sorted(items), size):
+                counts = supports.setdefault(itemset, [0, 0])
+                counts[0] += games
+                counts[1] += wins
+    return {itemset: tuple(counts) for itemset, counts in supports.items() if counts[0] >= min_count}
+
+
+def test_mine_finds_every_frequent_itemset():
+    rng = np.random.default_rng(3)
+    transactions = []
+    for _ in range(60):
+        items = sorted(set(rng.choice(list("abcdefg"), size=rng.integers(0, 6)).tolist()))
+        games = int(rng.integers(1, 4))
+        transactions.append((items, games, int(rng.integers(0, games + 1))))
+    for min_count in (1, 5, 20):
+        mined = mine(transactions, min_count)
+        itemsets = [tuple(sorted(itemset)) for itemset, _, _ in mined]
+        assert len(itemsets) == len(set(itemsets))
+        assert {tuple(sorted(itemset)): (games, wins) for itemset, games, wins in mined} == \
+            brute_force(transactions, min_count)
+
+
+def test_mine_without_frequent_items():
+    assert mine([(["a"], 1, 1), (["b"], 1, 0)], 2) == []
+    assert mine([], 1) == []
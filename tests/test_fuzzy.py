@@ -0,0 +1,39 @@
+import pytest
+
+from constants import HEROES, ITEMS
+from fuzzy import NGramIndex, edit_distance
+
+
+def levenshtein(a, b):
+    row = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        previous, row[0] = row[0], i
+        for j, other in enumerate(b, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (char != other))
+    return row[-1]
+
+
+@pytest.mark.parametrize("a, b", [
+    ("", ""), ("", "abc"), ("abc", ""), ("kitten", "sitting"), ("aaaa", "aa"), ("abab", "baba"),
+    ("thunderstrike_ring", "thunder_strike_rnig"), (ITEMS[0], ITEMS[-1]),
+])
+def test_edit_distance(a, b):
+    assert edit_distance(a, b) == levenshtein(a, b)
+
+
+def test_search_finds_every_close_name():
+    names = ITEMS + HEROES
+    index = NGramIndex(names)
+    for word in ["shild", "bombuss", "frostwnig", "xx", "a", ITEMS[3], HEROES[2][1:]]:
+        for max_distance in (1, 2, 3):
+            expected = sorted((levenshtein(word, name), name) for name in set(names)
+                              if levenshtein(word, name) <= max_distance)
+            assert index.search(word, max_distance) == expected
+
+
+def test_suggest_typos():
+    index = NGramIndex(ITEMS)
+    assert index.suggest("frostwnig")[0] == "frostwing"
+    assert index.suggest("bombus") == ["bombus"]
+    assert index.suggest("qqqqqqqqqqqqqqqqqqq") == []
+    assert len(index.suggest("a", count=2)) <= 2
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from conftest import make_matches
+from constants import ITEMS
+from game_table import GameTable
+from item_effects import design, fit, item_effects
+
+PENALTY = 0.5
+
+
+def table_with_a_strong_item():
+    matches = make_matches(60, games=5)
+    for match in matches:
+        for game in match["games"]:
+            if game["result"] == "W":
+                game["items"] = dict(sorted({**game["items"], ITEMS[-1]: 1}.items()))
+    return GameTable.from_data({"matches": matches})
+
+
+def dense_fit(x, y, ridge):
+    # The same penalized likelihood, maximized with dense Newton steps.
+    beta = np.zeros(x.shape[1])
+    for _ in range(50):
+        probability = 1 / (1 + np.exp(-x @ beta))
+        hessian = x.T @ (x * (probability * (1 - probability))[:, None]) + np.diag(ridge)
+        step = np.linalg.solve(hessian, x.T @ (y - probability) - ridge * beta)
+        beta += step
+        if np.abs(step).max() < 1e-10:
+            break
+    return beta, np.sqrt(np.diag(np.linalg.inv(hessian)))
+
+
+def test_fit_matches_a_dense_newton_fit():
+    table = table_with_a_strong_item()
+    dense, rows, cols, ptr, names, _ = design(table, min_games=1)
+    indicators = np.zeros((len(table), int(cols.max()) + 1))
+    indicators[rows, cols] = 1
+    d = dense.shape[1]
+    ridge = np.concatenate(([0], np.full(d - 1, 1e-6), np.full(indicators.shape[1], PENALTY)))
+    beta, errors = dense_fit(np.hstack((dense, indicators)), table.result.astype(np.float64), ridge)
+
+    effects, effect_errors, iterations = fit(dense, rows, cols, ptr, table.result, PENALTY)
+    assert iterations < 25
+    assert effects == pytest.approx(beta[d:], abs=1e-5)
+    assert effect_errors == pytest.approx(errors[d:], rel=1e-6)
+
+
+def test_item_effects_ranks_the_strong_item_first():
+    effects, _ = item_effects(table_with_a_strong_item(), min_games=1, penalty=PENALTY)
+    assert effects[0]["item"] == ITEMS[-1]
+    assert effects[0]["z"] > 2
+    assert [effect["effect"] for effect in effects] == sorted((effect["effect"] for effect in effects), reverse=True)
@@ -0,0 +1,75 @@
+import io
+import json
+
+import pytest
+
+import json_stream
+from conftest import make_matches
+from json_stream import iter_array
+from storage import iter_matches, save_snapshot
+
+
+def test_streams_the_array(monkeypatch):
+    # Small chunks make values straddle chunk boundaries.
+    monkeypatch.setattr(json_stream, "CHUNK_SIZE", 7)
+    data = {"version": [1, {"matches": []}], "matches": make_matches(5), "after": "ignored"}
+    assert list(iter_array(io.StringIO(json.dumps(data, indent=4)), "matches")) == data["matches"]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5])
+def test_values_split_across_chunks(monkeypatch, size):
+    monkeypatch.setattr(json_stream, "CHUNK_SIZE", size)
+    values = [12345, 6.5e3, -7, 0.25, True, None, "a\\u00e9", {"k": [1.5E-2]}]
+    assert list(iter_array(io.StringIO(json.dumps({"matches": values})), "matches")) == values
+
+
+def test_streams_a_stats_file(filename, monkeypatch):
+    monkeypatch.setattr(json_stream, "CHUNK_SIZE", 64)
+    matches = make_matches(6)
+    save_snapshot(filename, {"matches": matches})
+    assert list(json_stream.iter_matches(filename)) == matches
+    assert list(iter_matches(filename)) == matches
+
+
+def test_missing_key():
+    assert list(iter_array(io.StringIO('{"other": [1, 2]}'), "matches")) == []
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "[1, 2]",
+    '{"matches": [1, 2',
+    '{"matches": [1, 2,',
+    '{"matches": [1, {"start_rating": }]}',
+    '{"matches": [1, tru]}',
+    '{"matches" [1]}',
+    '{"matches": [{"hero": "a"} {"hero": "b"}]}',
+    '{"matches": [1, 2,]}',
+    '{"matches": [,1]}',
+    '{"other": 1 "matches": [1]}',
+    '{1: 2, "matches": [1]}',
+])
+def test_malformed_input(text):
+    with pytest.raises(ValueError):
+        list(iter_array(io.StringIO(text), "matches"))
+
+
+class CountingReader(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+def test_error_reports_the_stream_offset(monkeypatch):
+    monkeypatch.setattr(json_stream, "CHUNK_SIZE", 16)
+    text = '{"matches": [' + '{"hero": "a"}, ' * 10 + '{"hero": "a" "b"}, ' + '{"hero": "a"}, ' * 1000 + "]}"
+    error = text.index('"b"')
+    f = CountingReader(text)
+    with pytest.raises(ValueError, match=f"offset {error} "):
+        list(iter_array(f, "matches"))
+    # The error is raised where it is found, not after reading the rest.
+    assert f.reads < 20
@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pytest
+
+import storage
+from storage import files_lock, writer_lock
+
+
+class FakeMsvcrt:
+    # Exclusive locks as msvcrt.locking gives them, emulated with flock.
+    LK_NBLCK = 2
+    LK_UNLCK = 0
+
+    @staticmethod
+    def locking(fd, mode, nbytes):
+        import fcntl
+        if mode == FakeMsvcrt.LK_UNLCK:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise OSError("locked") from None
+
+
+def hold(filename, lock, held, release):
+    with lock(filename):
+        held.set()
+        release.wait()
+
+
+def check_waits(filename, lock, capsys):
+    held, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=hold, args=(filename, lock, held, release))
+    holder.start()
+    held.wait()
+    threading.Timer(0.2, release.set).start()
+    start = time.perf_counter()
+    with lock(filename):
+        waited = time.perf_counter() - start
+    holder.join()
+    assert waited >= 0.15
+    return capsys.readouterr().out
+
+
+def test_writers_wait_for_each_other(filename, capsys):
+    assert "Waiting for another process" in check_waits(filename, writer_lock, capsys)
+
+
+def test_readers_share_the_files_lock(filename):
+    # msvcrt has no shared locks, so Windows readers wait for each other.
+    pytest.importorskip("fcntl")
+    with files_lock(filename, shared=True):
+        with files_lock(filename, shared=True):
+            pass
+
+
+def test_windows_locks(filename, capsys, monkeypatch):
+    # Emulated with flock where there is no msvcrt.
+    pytest.importorskip("fcntl")
+    monkeypatch.setattr(storage, "fcntl", None)
+    monkeypatch.setattr(storage, "msvcrt", FakeMsvcrt, raising=False)
+    assert "Waiting for another process" in check_waits(filename, writer_lock, capsys)
+    check_waits(filename, files_lock, capsys)
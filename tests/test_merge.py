@@ -0,0 +1,35 @@
+import json
+
+from aggregates import Aggregates
+from batch_report import GLOBAL_REPORT, report_global
+from conftest import make_matches
+
+MATCHES = make_matches(12)
+
+
+def test_merge_matches_one_pass():
+    merged = Aggregates()
+    for first in range(0, len(MATCHES), 5):
+        merged.merge(Aggregates.from_data({"matches": MATCHES[first:first + 5]}))
+    assert merged.to_dict() == Aggregates.from_data({"matches": MATCHES}).to_dict()
+    assert Aggregates.from_matches(iter(MATCHES)).to_dict() == merged.to_dict()
+
+
+def test_merge_with_empty():
+    aggregates = Aggregates.from_data({"matches": MATCHES})
+    assert Aggregates().merge(aggregates).to_dict() == aggregates.to_dict()
+    assert Aggregates.from_data({"matches": MATCHES}).merge(Aggregates()).to_dict() == aggregates.to_dict()
+
+
+def test_dict_round_trip():
+    aggregates = Aggregates.from_data({"matches": MATCHES})
+    assert Aggregates.from_dict(aggregates.to_dict()).to_dict() == aggregates.to_dict()
+
+
+def test_users_merge_into_one_pass(tmp_path):
+    users = {"b": MATCHES[5:], "a": MATCHES[:5]}
+    results = {user: Aggregates.from_data({"matches": matches}).to_dict() for user, matches in users.items()}
+    merged = report_global(results, str(tmp_path), None, {})
+    assert merged.to_dict() == Aggregates.from_data({"matches": MATCHES}).to_dict()
+    with open(tmp_path / f"{GLOBAL_REPORT}.json", encoding="utf-8") as f:
+        assert json.load(f)["games"] == merged.games
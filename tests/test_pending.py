@@ -0,0 +1,138 @@
+import os
+
+import pytest
+
+import sqlite_storage
+import storage
+from conftest import make_matches
+from sqlite_storage import Database, connect, query_matches
+from storage import (Journal, PendingMatch, abandoned_pending, database_filename, import_filename, load_data,
+                     save_pending)
+
+
+class Crash(Exception):
+    pass
+
+
+def enter(filename, match, games=None):
+    # A session that enters match up to its games-th game, then stops.
+    pending = PendingMatch(filename)
+    try:
+        pending.append_match(match)
+        for game in match["games"][:games]:
+            pending.append_game(game)
+    finally:
+        pending.close()
+    return pending.path
+
+
+def crash_removing(module, path, monkeypatch):
+    remove = os.remove
+
+    def crash(target):
+        if target == path:
+            raise Crash
+        remove(target)
+
+    monkeypatch.setattr(module.os, "remove", crash)
+
+
+def database_matches(filename):
+    connection = connect(database_filename(filename))
+    try:
+        return list(query_matches(connection))
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize("recorder_class", [Journal, Database])
+def test_save_pending(filename, recorder_class):
+    matches = make_matches(2)
+    paths = [enter(filename, match) for match in matches]
+    recorder = recorder_class(database_filename(filename) if recorder_class is Database else filename)
+    try:
+        saved = [match for path in paths for match in save_pending(recorder, path)]
+    finally:
+        recorder.close()
+    assert saved == matches
+    assert not any(os.path.exists(path) for path in paths)
+    assert (database_matches(filename) if recorder_class is Database else load_data(filename)["matches"]) == matches
+
+
+def test_interrupted_session_keeps_its_games(filename):
+    match = make_matches(1, games=3)[0]
+    path = enter(filename, match, games=2)
+    assert abandoned_pending(filename) == [path]
+    recorder = Journal(filename)
+    try:
+        save_pending(recorder, path)
+    finally:
+        recorder.close()
+    assert load_data(filename)["matches"] == [dict(match, games=match["games"][:2])]
+
+
+def test_live_sessions_are_not_abandoned(filename):
+    pending = PendingMatch(filename)
+    try:
+        pending.append_match(make_matches(1)[0])
+        assert abandoned_pending(filename) == []
+    finally:
+        pending.close()
+    assert abandoned_pending(filename) == [pending.path]
+
+
+def test_journal_save_undone_until_pending_is_removed(filename, monkeypatch):
+    before, match = make_matches(1), make_matches(1, offset=1)[0]
+    path = enter(filename, match)
+    recorder = Journal(filename)
+    try:
+        recorder.import_matches(before)
+        crash_removing(storage, path, monkeypatch)
+        with pytest.raises(Crash):
+            save_pending(recorder, path)
+    finally:
+        recorder.close()
+    monkeypatch.undo()
+    assert load_data(filename)["matches"] == before
+
+    recorder = Journal(filename)
+    try:
+        assert abandoned_pending(filename) == [path]
+        save_pending(recorder, path)
+    finally:
+        recorder.close()
+    assert load_data(filename)["matches"] == before + [match]
+
+
+def test_journal_save_committed_once_pending_is_removed(filename, monkeypatch):
+    match = make_matches(1)[0]
+    path = enter(filename, match)
+    recorder = Journal(filename)
+    try:
+        crash_removing(storage, import_filename(filename), monkeypatch)
+        with pytest.raises(Crash):
+            save_pending(recorder, path)
+    finally:
+        recorder.close()
+    monkeypatch.undo()
+    assert load_data(filename)["matches"] == [match]
+
+    Journal(filename).close()
+    assert not os.path.exists(import_filename(filename))
+    assert load_data(filename)["matches"] == [match]
+
+
+def test_database_never_saves_pending_twice(filename, monkeypatch):
+    match = make_matches(1)[0]
+    path = enter(filename, match)
+    database = Database(database_filename(filename))
+    try:
+        crash_removing(sqlite_storage, path, monkeypatch)
+        with pytest.raises(Crash):
+            save_pending(database, path)
+        monkeypatch.undo()
+        assert save_pending(database, path) == []
+    finally:
+        database.close()
+    assert not os.path.exists(path)
+    assert database_matches(filename) == [match]
@@ -0,0 +1,57 @@
+from aggregates import Aggregates
+from conftest import make_matches
+from sqlite_storage import Database, connect, query_matches, query_tallies, query_totals
+
+
+def test_sqlite_round_trip(tmp_path):
+    matches = make_matches(6)
+    path = str(tmp_path / "stats.db")
+    database = Database(path)
+    try:
+        assert database.import_matches(iter(matches)) == len(matches)
+    finally:
+        database.close()
+    connection = connect(path)
+    try:
+        assert list(query_matches(connection)) == matches
+    finally:
+        connection.close()
+
+
+def test_sqlite_appends_match_by_match(tmp_path):
+    matches = make_matches(4)
+    path = str(tmp_path / "stats.db")
+    database = Database(path)
+    try:
+        for match in matches:
+            database.append_match(match)
+            for game in match["games"]:
+                database.append_game(game)
+    finally:
+        database.close()
+    connection = connect(path)
+    try:
+        assert list(query_matches(connection)) == matches
+    finally:
+        connection.close()
+
+
+def test_filtered_tallies(tmp_path):
+    matches = make_matches(12)
+    path = str(tmp_path / "stats.db")
+    database = Database(path)
+    try:
+        database.import_matches(iter(matches))
+    finally:
+        database.close()
+    hero = matches[0]["hero"]
+    expected = Aggregates.from_data({"matches": [match for match in matches if match["hero"] == hero]})
+    connection = connect(path)
+    try:
+        tallies = query_tallies(connection, hero=hero)
+        totals = query_totals(connection, hero=hero)
+    finally:
+        connection.close()
+    assert totals == (expected.games, expected.wins)
+    for name in ("opponents", "item_games", "game_numbers", "item_pairs"):
+        assert tallies[name] == dict(getattr(expected, name))
@@ -0,0 +1,114 @@
+import json
+
+import numpy as np
+import pytest
+
+import stats
+from aggregates import Aggregates, Tally
+from conftest import make_matches
+from constants import UNIQUES
+from stats_displayer import available_stats
+
+
+def with_uniques(matches):
+    for match in matches:
+        if UNIQUES.get(match["hero"]):
+            for game in match["games"][::2]:
+                game["items"] = dict(sorted({**game["items"], UNIQUES[match["hero"]][0]: 1}.items()))
+    return matches
+
+
+AGGREGATES = Aggregates.from_data({"matches": with_uniques(make_matches(40, games=5))})
+
+
+@pytest.mark.parametrize("stat", available_stats, ids=lambda stat: stat.__name__)
+def test_summary_is_json(stat):
+    json.dumps(stat.summary(AGGREGATES, min_games=1))
+
+
+def test_keyed_summary():
+    items, win_rates = stats.ItemWinRateStatistics.calculate_win_rates(AGGREGATES, 5, 1)
+    assert stats.ItemWinRateStatistics.summary(AGGREGATES, k=5, min_games=1) == dict(zip(items, win_rates))
+
+
+def test_labelled_summary():
+    items, wins, losses = stats.ItemUsageStatistics.calculate_usage(AGGREGATES, 30)
+    summary = stats.ItemUsageStatistics.summary(AGGREGATES)
+    assert list(summary) == items
+    assert summary[items[0]] == {"wins": wins[0], "losses": losses[0]}
+
+
+def test_column_summary():
+    matches, ratings = stats.RatingProgress.calculate_ratings(AGGREGATES)
+    assert stats.RatingProgress.summary(AGGREGATES) == {"match": matches, "rating": ratings}
+
+
+def test_rating_curve_default_bandwidth():
+    rating = stats.AccurateWinRateByRating
+    ratings, _, _ = rating.prepare_data(AGGREGATES)
+    default = rating.calculate_win_probability(AGGREGATES)
+    explicit = rating.calculate_win_probability(AGGREGATES, bandwidth=0.15 * (ratings.max() - ratings.min()))
+    assert (default[1] == explicit[1]).all()
+
+
+def test_rating_curve_self_weights():
+    rating = stats.AccurateWinRateByRating
+    ratings = np.linspace(900, 1400, 37) ** 1.01
+    grid, _ = rating.bin_ratings(ratings, np.ones((len(ratings), 1)), 64)
+    for bandwidth in (3.0, 40.0):
+        own = rating.self_weights(grid, ratings, bandwidth)
+        for index in (0, 5, 36):
+            one = np.zeros((len(ratings), 1))
+            one[index] = 1
+            _, binned = rating.bin_ratings(ratings, one, 64)
+            smoothed = rating.smooth_binned(grid, binned, ratings[index:index + 1], bandwidth)
+            assert smoothed[0, 0] == pytest.approx(own[index])
+
+
+def test_rating_curve_selected_bandwidth():
+    rating = stats.AccurateWinRateByRating
+    ratings, games, wins = rating.prepare_data(AGGREGATES)
+    bandwidth = rating.select_bandwidth(ratings, games, wins)
+    grid, _ = rating.bin_ratings(ratings, np.ones((len(ratings), 1)), rating.BINS)
+    assert np.isclose(bandwidth / (grid[-1] - grid[0]), rating.BANDWIDTHS).any()
+    selected = rating.calculate_win_probability(AGGREGATES, select=True)
+    assert (selected[1] == rating.calculate_win_probability(AGGREGATES, bandwidth=bandwidth)[1]).all()
+
+
+def test_rating_curve_bandwidth_modes():
+    rating = stats.AccurateWinRateByRating
+    for options in rating.BANDWIDTH_MODES.values():
+        summary = rating.summary(AGGREGATES, min_games=1, **options)
+        assert summary["win_probability"] == rating.calculate_win_probability(AGGREGATES, **options)[1].tolist()
+    assert rating.summary(AGGREGATES, select=True) != rating.summary(AGGREGATES)
+
+
+def rating_aggregates(count):
+    rng = np.random.default_rng(7)
+    ratings = rng.normal(1200, 150, count)
+    games = rng.integers(1, 4, count)
+    wins = rng.binomial(games, 1 / (1 + np.exp((ratings - 1200) / 100)))
+    aggregates = Aggregates()
+    aggregates.ratings = Tally(zip(ratings.tolist(), map(list, zip(games.tolist(), wins.tolist()))))
+    return aggregates
+
+
+def test_rating_curve_kernel_sums_match_a_dense_sum(monkeypatch):
+    rating = stats.AccurateWinRateByRating
+    monkeypatch.setattr(rating, "KERNEL_CHUNK", 100)
+    ratings = np.linspace(900, 1500, 777)
+    values = np.stack([np.sin(ratings) ** 2, np.ones(len(ratings))], axis=1)
+    x_values = np.linspace(900, 1500, 50)
+    dense = np.exp(-0.5 * ((x_values[:, None] - ratings[None, :]) / 40.0) ** 2) @ values
+    assert rating.kernel_sums(ratings, values, x_values, 40.0) == pytest.approx(dense, rel=1e-12)
+
+
+def test_rating_curve_binning_stays_close_to_the_exact_curve(monkeypatch):
+    rating = stats.AccurateWinRateByRating
+    aggregates = rating_aggregates(5000)
+    _, exact = rating.calculate_win_probability(aggregates)
+    _, binned = rating.calculate_win_probability(aggregates, bins=rating.BINS)
+    assert np.abs(binned - exact).max() < 1e-5
+    # Above EXACT_LIMIT distinct ratings the same binned curve is the default.
+    monkeypatch.setattr(rating, "EXACT_LIMIT", 1000)
+    assert (rating.calculate_win_probability(aggregates)[1] == binned).all()
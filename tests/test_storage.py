@@ -0,0 +1,130 @@
+import os
+
+import pytest
+
+from conftest import make_matches
+from storage import (Journal, compact, drop_partial_record, import_filename, iter_matches, journal_filename, load_data,
+                     save_snapshot)
+
+
+def test_json_round_trip(filename):
+    data = {"matches": make_matches(6)}
+    save_snapshot(filename, data)
+    assert load_data(filename) == data
+
+
+def test_journal_replay(filename):
+    snapshot, journal = make_matches(3), make_matches(4, offset=3)
+    save_snapshot(filename, {"matches": snapshot})
+    recorder = Journal(filename)
+    try:
+        recorder.append_match(journal[0])
+        for game in journal[0]["games"]:
+            recorder.append_game(game)
+        recorder.import_matches(iter(journal[1:]))
+    finally:
+        recorder.close()
+    assert load_data(filename)["matches"] == snapshot + journal
+    assert list(iter_matches(filename)) == snapshot + journal
+
+
+def test_journal_without_snapshot(filename):
+    matches = make_matches(3)
+    recorder = Journal(filename)
+    try:
+        recorder.import_matches(iter(matches))
+    finally:
+        recorder.close()
+    assert not os.path.exists(filename)
+    assert load_data(filename)["matches"] == matches
+
+
+def test_replay_ignores_partial_record(filename):
+    matches = make_matches(2)
+    recorder = Journal(filename)
+    try:
+        recorder.import_matches(iter(matches))
+    finally:
+        recorder.close()
+    with open(journal_filename(filename), "a", encoding="utf-8") as f:
+        f.write('{"game": {"result": "W", "oppo')
+    assert load_data(filename)["matches"] == matches
+
+
+def test_drop_partial_record(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_bytes(b'{"match": 1}\n{"game": 2}\n{"game": 3')
+    drop_partial_record(str(path))
+    assert path.read_bytes() == b'{"match": 1}\n{"game": 2}\n'
+
+    drop_partial_record(str(path))
+    assert path.read_bytes() == b'{"match": 1}\n{"game": 2}\n'
+
+
+def test_drop_partial_record_spanning_blocks(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_bytes(b'{"match": 1}\n' + b"x" * 10000)
+    drop_partial_record(str(path))
+    assert path.read_bytes() == b'{"match": 1}\n'
+
+    path.write_bytes(b"x" * 10000)
+    drop_partial_record(str(path))
+    assert path.read_bytes() == b""
+
+
+def test_journal_drops_partial_record_before_appending(filename):
+    matches = make_matches(2)
+    with open(journal_filename(filename), "w", encoding="utf-8") as f:
+        f.write('{"match": {"start_rating": 1')
+    recorder = Journal(filename)
+    try:
+        recorder.import_matches(iter(matches))
+    finally:
+        recorder.close()
+    assert load_data(filename)["matches"] == matches
+
+
+class Crash(Exception):
+    pass
+
+
+def crash_after(matches, count):
+    for index, match in enumerate(matches):
+        if index == count:
+            raise Crash
+        yield match
+
+
+def test_interrupted_import_is_never_replayed_in_part(filename):
+    before, batch, after = make_matches(2), make_matches(5, offset=2), make_matches(1, offset=7)
+    recorder = Journal(filename)
+    try:
+        recorder.import_matches(iter(before))
+        with pytest.raises(Crash):
+            recorder.import_matches(crash_after(batch, 3))
+    finally:
+        recorder.close()
+    assert os.path.exists(import_filename(filename))
+    assert load_data(filename)["matches"] == before
+
+    # The next writer drops the partial batch before appending.
+    recorder = Journal(filename)
+    try:
+        recorder.import_matches(iter(after))
+    finally:
+        recorder.close()
+    assert not os.path.exists(import_filename(filename))
+    assert load_data(filename)["matches"] == before + after
+
+
+def test_compaction_drops_an_interrupted_import(filename):
+    before, batch = make_matches(2), make_matches(5, offset=2)
+    recorder = Journal(filename)
+    try:
+        recorder.import_matches(iter(before))
+        with pytest.raises(Crash):
+            recorder.import_matches(crash_after(batch, 3))
+    finally:
+        recorder.close()
+    assert compact(filename)["matches"] == before
+    assert load_data(filename)["matches"] == before
@@ -0,0 +1,49 @@
+import pytest
+
+from constants import HEROES, ITEMS, RELICS, UNIQUES
+from vocabulary import Vocabulary, hero_vocabulary, item_vocabulary, relic_mask, unique_mask
+
+
+def expected_relics(item_names):
+    return [item in RELICS for item in item_names]
+
+
+def expected_uniques(heroes, item_names):
+    return [[item in UNIQUES.get(hero, ()) for item in item_names] for hero in heroes]
+
+
+def test_ids_in_order_of_first_appearance():
+    vocabulary = Vocabulary(["b", "a"])
+    assert [vocabulary.id(name) for name in ["a", "c", "b", "c"]] == [1, 2, 0, 2]
+    assert vocabulary.names == ["b", "a", "c"]
+    assert "c" in vocabulary and "d" not in vocabulary
+    name = "".join(["c"])
+    assert vocabulary.intern(name) is vocabulary.names[2]
+
+
+@pytest.mark.parametrize("item_names", [
+    ITEMS,
+    ITEMS + ["not an item"],
+    ["not an item"] + ITEMS[::-1],
+    list(RELICS)[:3] + ITEMS[:5],
+    [],
+])
+def test_relic_mask(item_names):
+    assert relic_mask(item_names).tolist() == expected_relics(item_names)
+
+
+@pytest.mark.parametrize("heroes, item_names", [
+    (HEROES, ITEMS),
+    (HEROES + ["not a hero"], ITEMS + ["not an item"]),
+    (HEROES[::-1], ITEMS),
+    (HEROES, ITEMS[::-1]),
+    (["not a hero"] + HEROES[:3], [item for items in UNIQUES.values() for item in items][:6]),
+])
+def test_unique_mask(heroes, item_names):
+    assert unique_mask(heroes, item_names).tolist() == expected_uniques(heroes, item_names)
+
+
+def test_default_vocabularies_start_with_the_constants():
+    assert hero_vocabulary().names == HEROES
+    assert item_vocabulary().names == ITEMS
+    assert relic_mask(ITEMS).any() and unique_mask(HEROES, ITEMS).any()
@@ -1,12 +1,18 @@
-import json
 import os
 
-from autocomplete import input_with_autocomplete
-from collections import Counter
-from constants import HEROES, ITEMS, RELICS
+from aggregates import Aggregates, append_cache, fresh_cache, load_cache, save_cache, source_signature
+from autocomplete import input_with_autocomplete, set_usage
+from constants import HEROES, ITEMS
+from sqlite_storage import Database
+from storage import (Journal, PendingMatch, abandoned_pending, database_filename, save_pending, uses_database,
+                     writer_lock)
+from vocabulary import HERO_SET, ITEM_SET
 
+# Rank item completions by this user's usage with the current hero, rather than overall.
+RANK_BY_HERO = True
 
-def add_game():
+
+def add_game(usage=None):
     game = {}
 
     while True:
@@ -28,7 +34,7 @@ def add_game():
         "  Opponent hero: ",
         "  Invalid hero. Please enter a valid hero name",
         options=HEROES,
-        validator=lambda x: x.lower() in HEROES
+        validator=lambda x: x.lower() in HERO_SET
     ).lower()
 
     items = {}
@@ -39,7 +45,7 @@ def add_game():
             f"    Item {item_count}: ",
             "    Invalid item. Please enter a valid item name.",
             options=ITEMS,
-            validator=lambda x: not x or x.lower() in ITEMS
+            validator=lambda x: not x or x.lower() in ITEM_SET
         )
         if not item:
             break
@@ -50,10 +56,14 @@ def add_game():
         item_count += 1
     game["items"] = dict(sorted(items.items()))
 
+    if usage is not None:
+        for item in items:
+            usage[item] = usage.get(item, 0) + 1
+
     return game
 
 
-def add_match():
+def add_match(pending, aggregates=None, usage_by_hero=None):
     match = {}
 
     while True:
@@ -76,19 +86,31 @@ def add_match():
         "  Hero: ",
         "  Invalid hero. Please enter a valid hero name",
         options=HEROES,
-        validator=lambda x: x.lower() in HEROES
+        validator=lambda x: x.lower() in HERO_SET
     ).lower()
 
     match["games"] = []
+    pending.append_match(match)
+
+    usage = None
+    if aggregates is not None:
+        # Counts come from the cached tallies and are kept up to date per game,
+        # so ranking never rescans the history.
+        hero = match["hero"] if RANK_BY_HERO else None
+        if hero not in usage_by_hero:
+            usage_by_hero[hero] = aggregates.item_usage(hero)
+        usage = usage_by_hero[hero]
+        set_usage(ITEMS, usage)
 
     game_count = 1
     while True:
         print(f"\nEnter data for game {game_count}:")
 
-        game = add_game()
+        game = add_game(usage)
         game_count += 1
 
         match["games"].append(game)
+        pending.append_game(game)
 
         cont = input("Add another game? (y/n): ").strip().lower()
         if cont != 'y':
@@ -97,6 +119,25 @@ def add_match():
     return match
 
 
+def save_matches(filename, paths):
+    # Moves the matches of pending files into the history and adds them to
+    # the cache, if it was up to date; the caller holds the writer lock.
+    base = fresh_cache(filename)
+    if uses_database(filename):
+        recorder = Database(database_filename(filename))
+    else:
+        recorder = Journal(filename)
+    saved = []
+    try:
+        for path in paths:
+            saved.extend(save_pending(recorder, path))
+    finally:
+        recorder.close()
+    if base is not None:
+        append_cache(filename, base, Aggregates.from_data({"matches": saved}))
+    return recorder.path, len(saved)
+
+
 def main():
     dirname = "data"
     user = input("Enter username: ").strip()
@@ -105,31 +146,45 @@ def main():
     if not os.path.exists(dirname):
         os.makedirs(dirname)
 
-    if os.path.exists(filename):
-        with open(filename, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    else:
-        data = {
-            "matches": []
-        }
+    with writer_lock(filename):
+        abandoned = abandoned_pending(filename)
+        if abandoned:
+            path, count = save_matches(filename, abandoned)
+            if count:
+                print(f"Saved {count} matches left unsaved by an interrupted session to {path}")
+
+    # Read without the writer lock. A rebuilt cache is saved, so that the
+    # matches entered below are added to it rather than leaving it stale.
+    aggregates = load_cache(filename)
+    if aggregates is None:
+        source = source_signature(filename)
+        aggregates = Aggregates.from_storage(filename)
+        save_cache(filename, aggregates, source)
+    usage_by_hero = {}
 
     match_count = 1
     while True:
         print(f"\nEnter data for match {match_count}:")
 
-        match = add_match()
+        # Every game is written to the pending file as soon as it is entered,
+        # but the writer lock is only held to save the finished match, so
+        # other writers can run while a match is being typed.
+        with writer_lock(filename):
+            pending = PendingMatch(filename)
+        try:
+            add_match(pending, aggregates, usage_by_hero)
+        finally:
+            pending.close()
         match_count += 1
 
-        data["matches"].append(match)
+        with writer_lock(filename):
+            path, _ = save_matches(filename, [pending.path])
 
         cont = input("Add another match? (y/n): ").strip().lower()
         if cont != 'y':
             break
 
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
-
-    print(f"\nAll matches successfully saved to {filename}")
+    print(f"\nAll matches successfully saved to {path}")
 
 
 if __name__ == "__main__":
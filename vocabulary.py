@@ -0,0 +1,78 @@
+import sys
+
+import numpy as np
+
+from constants import HEROES, ITEMS, RELICS, UNIQUES
+
+HERO_SET = frozenset(HEROES)
+ITEM_SET = frozenset(ITEMS)
+RELIC_SET = frozenset(RELICS)
+UNIQUE_SETS = {hero: frozenset(items) for hero, items in UNIQUES.items()}
+
+
+class Vocabulary:
+    # Dense integer IDs for names, in order of first appearance. Names are
+    # interned, so equal names loaded from different records share one object.
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.id(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def id(self, name):
+        index = self.ids.get(name)
+        if index is None:
+            index = self.ids[name] = len(self.names)
+            self.names.append(sys.intern(name))
+        return index
+
+    def intern(self, name):
+        return self.names[self.id(name)]
+
+
+def hero_vocabulary():
+    return Vocabulary(HEROES)
+
+
+def item_vocabulary():
+    return Vocabulary(ITEMS)
+
+
+RELIC_MASK = np.array([item in RELIC_SET for item in ITEMS], dtype=bool)
+UNIQUE_MASK = np.zeros((len(HEROES), len(ITEMS)), dtype=bool)
+for hero, items in UNIQUES.items():
+    UNIQUE_MASK[HEROES.index(hero), [ITEMS.index(item) for item in items]] = True
+
+
+def extends(names, base):
+    return len(names) >= len(base) and all(a is b or a == b for a, b in zip(names, base))
+
+
+def relic_mask(item_names):
+    # Names outside constants.py are never relics, so a vocabulary that starts
+    # with ITEMS reuses the precomputed mask.
+    if extends(item_names, ITEMS):
+        mask = np.zeros(len(item_names), dtype=bool)
+        mask[:len(ITEMS)] = RELIC_MASK
+        return mask
+    return np.array([item in RELIC_SET for item in item_names], dtype=bool)
+
+
+def unique_mask(heroes, item_names):
+    # mask[hero, item] is True when the item is unique to that hero.
+    if extends(heroes, HEROES) and extends(item_names, ITEMS):
+        mask = np.zeros((len(heroes), len(item_names)), dtype=bool)
+        mask[:len(HEROES), :len(ITEMS)] = UNIQUE_MASK
+        return mask
+    items = Vocabulary(item_names)
+    mask = np.zeros((len(heroes), len(item_names)), dtype=bool)
+    for hero_id, hero in enumerate(heroes):
+        owned = [items.ids[item] for item in UNIQUE_SETS.get(hero, ()) if item in items]
+        mask[hero_id, owned] = True
+    return mask